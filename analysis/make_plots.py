@@ -3,124 +3,34 @@
 #
 # Input: CSV from scripts/collect_csv.py (or older variants).
 # Saves plots into results/figures (default) and optionally copies to paper/figures.
+#
+# Figures are rendered from plain-data specs in a process pool (--jobs), with
+# matplotlib imported lazily on the Agg backend. Time series longer than
+# --max-points are LTTB-downsampled (Largest-Triangle-Three-Buckets), so a
+# multi-hour 10 Hz run draws in seconds into a small PNG. The downsampled
+# series are also saved as <prefix>__series.csv.
+#
+# --campaign overlays several runs from their segment tables (and, with
+# --series, those saved series) without touching the raw files:
+#   python3 analysis/make_plots.py --campaign results/segments_steady_*.csv results/segments_knee_final.csv \
+#       --series results/figures/*__series.csv
 
 import argparse
 import csv
-import gzip
+import filecmp
 import math
 import os
-import statistics
-from dataclasses import dataclass
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional, Dict, Tuple
 
-import matplotlib.pyplot as plt
-
-
-ALIASES = {
-    "t_sec": ["t_sec", "t", "time_sec"],
-    "u_cmd": ["u_cmd", "lam_cmd", "lambda", "target_lambda", "rate"],
-    "sent_total": ["sent_total", "sent", "total_sent", "sent_ok_total", "ok_total"],
-    "u_ach": ["u_ach", "u_ach_from_total", "u_ach_reported", "sent_per_sec", "sent_per_sec_reported"],
-    "lat_p99": ["lat_p99", "y_lat_p99_sec", "lat_p99_sec", "p99", "latency_p99"],
-    "inflight": ["inflight", "in_flight"],
-    "err_per_sec": ["err_per_sec", "errors_per_sec", "errRate"],
-}
-
-def pick_col(fieldnames: List[str], keys: List[str]) -> Optional[str]:
-    exact = {h.strip(): h.strip() for h in fieldnames}
-    for k in keys:
-        if k in exact:
-            return k
-    lower = {h.strip().lower(): h.strip() for h in fieldnames}
-    for k in keys:
-        lk = k.lower()
-        if lk in lower:
-            return lower[lk]
-    return None
-
-def ffloat(x: str) -> Optional[float]:
-    x = (x or "").strip()
-    if not x:
-        return None
-    try:
-        return float(x)
-    except Exception:
-        return None
-
-def fint(x: str) -> Optional[int]:
-    x = (x or "").strip()
-    if not x:
-        return None
-    try:
-        return int(float(x))
-    except Exception:
-        return None
-
-def median(xs: List[float]) -> float:
-    return statistics.median(xs) if xs else float("nan")
-
-@dataclass
-class Row:
-    t_sec: float
-    u_cmd: float
-    sent_total: Optional[int]
-    u_ach: Optional[float]
-    lat_p99: Optional[float]
-    inflight: Optional[float]
-    err_per_sec: Optional[float]
-
-def open_maybe_gz(path: str):
-    if path.endswith(".gz"):
-        return gzip.open(path, "rt", newline="")
-    return open(path, "r", newline="")
-
-def compute_u_ach_from_sent(rows: List[Row]) -> None:
-    prev_sent = None
-    prev_t = None
-    for r in rows:
-        if r.u_ach is not None and r.u_ach > 0:
-            if r.sent_total is not None:
-                prev_sent = r.sent_total
-                prev_t = r.t_sec
-            continue
+from qsketch import QuantileSketch
+from runload import load_run, segment_bounds
 
-        if r.sent_total is None or prev_sent is None or prev_t is None:
-            if r.sent_total is not None:
-                prev_sent = r.sent_total
-                prev_t = r.t_sec
-            continue
-
-        dt = r.t_sec - prev_t
-        ds = r.sent_total - prev_sent
-        if dt > 0 and ds >= 0:
-            r.u_ach = ds / dt
-
-        prev_sent = r.sent_total
-        prev_t = r.t_sec
-
-def detect_segments_by_u_cmd(rows: List[Row], min_seg_s: float = 8.0) -> List[List[Row]]:
-    if not rows:
-        return []
-    segs: List[List[Row]] = []
-    cur = [rows[0]]
-    for r in rows[1:]:
-        if abs(r.u_cmd - cur[-1].u_cmd) < 1e-9:
-            cur.append(r)
-        else:
-            segs.append(cur)
-            cur = [r]
-    segs.append(cur)
-
-    out = []
-    for s in segs:
-        dur = s[-1].t_sec - s[0].t_sec
-        if dur >= min_seg_s and len(s) >= 3:
-            out.append(s)
-    return out
 
 def safe_stem(path: str) -> str:
     base = os.path.basename(path)
-    for suf in [".csv.gz", ".csv"]:
+    for suf in [".csv.gz", ".csv", ".runbin"]:
         if base.endswith(suf):
             base = base[: -len(suf)]
             break
@@ -129,127 +39,309 @@ def safe_stem(path: str) -> str:
 def ensure_dir(d: str) -> None:
     os.makedirs(d, exist_ok=True)
 
-def save_fig(fig, outpath: str, dpi: int = 150):
+def pyplot():
+    """pyplot on the Agg backend, imported on first use (in the rendering process)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def lttb(x: List[float], y: List[float], n_out: int) -> Tuple[List[float], List[float]]:
+    """Largest-Triangle-Three-Buckets: n_out points that keep the visual shape of (x, y)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return list(x), list(y)
+    ox, oy = [x[0]], [y[0]]
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        # average of the next bucket is the third triangle vertex
+        lo = int((i + 1) * every) + 1
+        hi = min(int((i + 2) * every) + 1, n)
+        cnt = hi - lo
+        avg_x = sum(x[lo:hi]) / cnt
+        avg_y = sum(y[lo:hi]) / cnt
+        # pick the point of this bucket spanning the largest triangle with a and the average
+        b_lo = int(i * every) + 1
+        b_hi = int((i + 1) * every) + 1
+        ax_, ay_ = x[a], y[a]
+        best, best_area = b_lo, -1.0
+        for j in range(b_lo, b_hi):
+            area = abs((ax_ - avg_x) * (y[j] - ay_) - (ax_ - x[j]) * (avg_y - ay_))
+            if area > best_area:
+                best, best_area = j, area
+        ox.append(x[best])
+        oy.append(y[best])
+        a = best
+    ox.append(x[-1])
+    oy.append(y[-1])
+    return ox, oy
+
+def downsample(t: List[float], y: List[float], budget: int) -> Tuple[List[float], List[float]]:
+    """
+    At most `budget` points: LTTB over each run of finite values, with the
+    budget shared by run length and a NaN separator between runs so gaps
+    stay gaps. When there are more gaps than budget/4 (a noisy raw log), only
+    the widest ones (in t) wider than the output point spacing are kept as
+    separators; runs across the others are joined, since the plot could not
+    show them anyway.
+    """
+    if budget <= 0 or len(t) <= budget:
+        return list(t), list(y)
+    runs: List[Tuple[int, int]] = []
+    start = None
+    for i, v in enumerate(y):
+        if v == v:
+            if start is None:
+                start = i
+        elif start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(y)))
+    if not runs:
+        return [], []
+
+    # separators: every gap if there are few; else those wider than the output point
+    # spacing, widest first, at most budget // 4 of them
+    width = lambda g: t[runs[g + 1][0]] - t[runs[g][1] - 1]
+    gaps = list(range(len(runs) - 1))
+    if len(gaps) > budget // 4:
+        spacing = (t[runs[-1][1] - 1] - t[runs[0][0]]) / budget
+        gaps = sorted((g for g in gaps if width(g) > spacing), key=width, reverse=True)[:budget // 4]
+    cut = set(gaps)
+    groups: List[List[int]] = [[]]
+    for g, (lo, hi) in enumerate(runs):
+        groups[-1].extend(range(lo, hi))
+        if g in cut:
+            groups.append([])
+
+    avail = budget - len(cut)
+    total = sum(len(idx) for idx in groups)
+    ox: List[float] = []
+    oy: List[float] = []
+    for idx in groups:
+        n_out = min(len(idx), avail * len(idx) // total)
+        if n_out == 0:
+            continue
+        gx = [t[i] for i in idx]
+        gy = [y[i] for i in idx]
+        if n_out >= 3:
+            rx, ry = lttb(gx, gy, n_out)
+        else:
+            # too few points for a triangle: the ends of the group
+            keep = [0, len(idx) - 1][:n_out]
+            rx, ry = [gx[k] for k in keep], [gy[k] for k in keep]
+        if ox:
+            ox.append(rx[0])
+            oy.append(float("nan"))
+        ox.extend(rx)
+        oy.extend(ry)
+    return ox, oy
+
+def render(spec: Dict) -> str:
+    """Draw one figure from a plain-data spec (picklable, so it can run in a worker)."""
+    plt = pyplot()
+    fig = plt.figure(figsize=spec["figsize"])
+    ax = fig.add_subplot(111)
+    for x, y, label in spec.get("lines", []):
+        if "marker" in spec:
+            ax.plot(x, y, label=label, marker=spec["marker"], markersize=4)
+        else:
+            ax.plot(x, y, label=label)
+    for x, y in spec.get("scatter", []):
+        ax.scatter(x, y)
+    ax.set_xlabel(spec["xlabel"])
+    ax.set_ylabel(spec["ylabel"])
+    ax.set_title(spec["title"])
+    if spec.get("lines"):
+        ax.legend()
     fig.tight_layout()
-    fig.savefig(outpath, dpi=dpi)
+    fig.savefig(spec["out"], dpi=spec["dpi"])
     plt.close(fig)
+    return spec["out"]
+
+def write_series(path: str, series: Dict[str, Tuple[List[float], List[float]]]) -> None:
+    """Downsampled time series in long format (series,t_sec,value), for --campaign overlays."""
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["series", "t_sec", "value"])
+        for name, (xs, ys) in series.items():
+            for x, y in zip(xs, ys):
+                w.writerow([name, f"{x:.3f}", "" if y != y else f"{y:.9g}"])
+
+def read_series(path: str) -> Dict[str, Tuple[List[float], List[float]]]:
+    out: Dict[str, Tuple[List[float], List[float]]] = {}
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            xs, ys = out.setdefault(row["series"], ([], []))
+            xs.append(float(row["t_sec"]))
+            ys.append(float(row["value"]) if row["value"] else float("nan"))
+    return out
+
+def table_name(path: str, suffix: str) -> str:
+    base = os.path.basename(path)
+    if base.startswith("segments_"):
+        base = base[len("segments_"):]
+    return base[:-len(suffix)] if base.endswith(suffix) else base
+
+def read_segment_tables(paths: List[str]) -> Dict[str, List[Dict[str, float]]]:
+    """Run name -> segment rows (u_cmd, sat_med, lat_med_s, ...) from summarize_run segment CSVs.
+    A batch campaign table (with a run column) contributes one entry per run."""
+    runs: Dict[str, List[Dict[str, float]]] = {}
+    for p in paths:
+        with open(p, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                name = row.get("run") or table_name(p, ".csv")
+                vals = {k: (float(v) if v not in ("", None) else float("nan"))
+                        for k, v in row.items() if k != "run"}
+                runs.setdefault(name, []).append(vals)
+    return runs
+
+def campaign_specs(args) -> List[Dict]:
+    runs = read_segment_tables(args.campaign)
+    if not runs:
+        raise SystemExit("ERROR: --campaign: no segment rows")
+    prefix = args.prefix.strip() or "campaign"
+
+    def out(name: str) -> str:
+        return os.path.join(args.outdir, f"{prefix}__{name}.png")
+
+    def curve(rows: List[Dict[str, float]], col: str) -> Tuple[List[float], List[float]]:
+        # one point per level (median over repeated visits), in u_cmd order
+        by_u: Dict[float, QuantileSketch] = {}
+        for r in rows:
+            v = r.get(col, float("nan"))
+            if v == v and r["u_cmd"] > 0:
+                by_u.setdefault(r["u_cmd"], QuantileSketch()).add(v)
+        us = sorted(by_u)
+        return us, [by_u[u].median() for u in us]
+
+    specs = [
+        {"out": out("saturation_vs_u_cmd"), "figsize": (7, 5), "dpi": args.dpi, "marker": "o",
+         "lines": [(*curve(rows, "sat_med"), name) for name, rows in runs.items()],
+         "xlabel": "u_cmd, tx/s", "ylabel": "median saturation (u_ach/u_cmd)",
+         "title": "Saturation vs u_cmd (segment medians, by run)"},
+        {"out": out("lat_p99_vs_u_cmd"), "figsize": (7, 5), "dpi": args.dpi, "marker": "o",
+         "lines": [(*curve(rows, "lat_med_s"), name) for name, rows in runs.items()],
+         "xlabel": "u_cmd, tx/s", "ylabel": "median lat_p99, s",
+         "title": "lat_p99 vs u_cmd (segment medians, by run)"},
+    ]
+    if args.series:
+        lat_lines = []
+        for p in args.series:
+            ser = read_series(p)
+            if "lat_p99" in ser:
+                xs, ys = ser["lat_p99"]
+                t0 = xs[0] if xs else 0.0
+                lat_lines.append(([x - t0 for x in xs], ys, table_name(p, "__series.csv")))
+        if lat_lines:
+            specs.append({"out": out("lat_p99_timeseries"), "figsize": (10, 4), "dpi": args.dpi,
+                          "lines": lat_lines, "xlabel": "time since run start, s", "ylabel": "seconds",
+                          "title": "Confirmation latency p99 (by run)"})
+    return specs
 
 def maybe_copy(outpath: str, paper_dir: Optional[str]):
+    """Copy a figure to paper_dir unless an identical file is already there."""
     if not paper_dir:
         return
     ensure_dir(paper_dir)
     dst = os.path.join(paper_dir, os.path.basename(outpath))
     try:
-        # simple copy (no shutil to keep it minimal)
-        with open(outpath, "rb") as fsrc:
-            with open(dst, "wb") as fdst:
-                fdst.write(fsrc.read())
-    except Exception:
+        if os.path.exists(dst) and filecmp.cmp(outpath, dst, shallow=False):
+            return
+        shutil.copyfile(outpath, dst)
+    except OSError:
         pass
 
 def main():
     ap = argparse.ArgumentParser(description="Build standard figures from a run CSV (stdlib + matplotlib, no pandas).")
-    ap.add_argument("csv_path")
+    ap.add_argument("csv_path", nargs="?", help="Run file (raw CSV, .csv.gz or runbin)")
+    ap.add_argument("--campaign", nargs="+", default=[], metavar="SEGMENTS_CSV",
+                    help="Overlay runs from summarize_run segment tables (results/segments_*.csv or a batch "
+                         "segments_campaign.csv) instead of plotting one raw run")
+    ap.add_argument("--series", nargs="+", default=[], metavar="SERIES_CSV",
+                    help="With --campaign: downsampled series (<prefix>__series.csv, written by single-run mode) "
+                         "to overlay as lat_p99 time series")
     ap.add_argument("--outdir", default="results/figures")
     ap.add_argument("--paperdir", default="", help="If set, copy figures to this dir as well (e.g., paper/figures)")
     ap.add_argument("--prefix", default="", help="Filename prefix for plots (default: stem of csv)")
     ap.add_argument("--min-seg-s", type=float, default=8.0, help="Minimum segment duration for step medians.")
     ap.add_argument("--dpi", type=int, default=150)
+    ap.add_argument("--max-points", type=int, default=4000,
+                    help="LTTB-downsample time series longer than this (0 = plot every point).")
+    ap.add_argument("--jobs", type=int, default=0, help="Figure rendering processes (0 = one per figure/core, 1 = serial).")
     args = ap.parse_args()
 
     paperdir = args.paperdir.strip() or None
     ensure_dir(args.outdir)
 
-    with open_maybe_gz(args.csv_path) as f:
-        r = csv.DictReader(f)
-        if r.fieldnames is None:
-            raise SystemExit("ERROR: no header found")
-
-        col_t = pick_col(r.fieldnames, ALIASES["t_sec"])
-        col_u = pick_col(r.fieldnames, ALIASES["u_cmd"])
-        col_sent = pick_col(r.fieldnames, ALIASES["sent_total"])
-        col_uach = pick_col(r.fieldnames, ALIASES["u_ach"])
-        col_lat = pick_col(r.fieldnames, ALIASES["lat_p99"])
-        col_infl = pick_col(r.fieldnames, ALIASES["inflight"])
-        col_err = pick_col(r.fieldnames, ALIASES["err_per_sec"])
-
-        if col_t is None or col_u is None:
-            raise SystemExit("ERROR: need t_sec and u_cmd (or aliases)")
-
-        rows: List[Row] = []
-        for row in r:
-            t = ffloat(row.get(col_t, ""))
-            u = ffloat(row.get(col_u, ""))
-            if t is None or u is None:
-                continue
-
-            sent = fint(row.get(col_sent, "")) if col_sent else None
-            uach = ffloat(row.get(col_uach, "")) if col_uach else None
-            lat = ffloat(row.get(col_lat, "")) if col_lat else None
-            infl = ffloat(row.get(col_infl, "")) if col_infl else None
-            err = ffloat(row.get(col_err, "")) if col_err else None
+    if args.campaign:
+        # segment tables and cached series only: the raw runs are not read again
+        finish(campaign_specs(args), args, paperdir)
+        return
+    if not args.csv_path:
+        ap.error("a run file or --campaign is required")
 
-            rows.append(Row(t_sec=t, u_cmd=u, sent_total=sent, u_ach=uach, lat_p99=lat, inflight=infl, err_per_sec=err))
+    # sort by time, then fill missing or non-positive u_ach from sent_total
+    run = load_run(args.csv_path, order_by="t_sec", fill_nonpositive=True)
+    if run.n < 5:
+        raise SystemExit(f"ERROR: too few rows parsed: {run.n}")
 
-    if len(rows) < 5:
-        raise SystemExit(f"ERROR: too few rows parsed: {len(rows)}")
+    prefix = args.prefix.strip() or safe_stem(args.csv_path)
 
-    # sort by time
-    rows.sort(key=lambda x: x.t_sec)
+    t = list(run["t_sec"])
+    u_cmd = run["u_cmd"]
+    u_ach = [x if x > 0 else float("nan") for x in run["u_ach"]]
+    lat = [x if x > 0 else float("nan") for x in run["lat_p99"]]
 
-    # fill missing u_ach from sent_total if possible
-    compute_u_ach_from_sent(rows)
+    def out(name: str) -> str:
+        return os.path.join(args.outdir, f"{prefix}__{name}.png")
 
-    prefix = args.prefix.strip() or safe_stem(args.csv_path)
+    series = {
+        "u_cmd": downsample(t, list(u_cmd), args.max_points),
+        "u_ach": downsample(t, u_ach, args.max_points),
+        "lat_p99": downsample(t, lat, args.max_points),
+    }
 
+    specs: List[Dict] = []
     # ---------- Plot 1: throughput timeseries ----------
-    t = [x.t_sec for x in rows]
-    u_cmd = [x.u_cmd for x in rows]
-    u_ach = [x.u_ach if (x.u_ach is not None and x.u_ach > 0) else float("nan") for x in rows]
-
-    fig = plt.figure(figsize=(10, 4))
-    ax = fig.add_subplot(111)
-    ax.plot(t, u_cmd, label="u_cmd")
-    ax.plot(t, u_ach, label="u_ach")
-    ax.set_xlabel("time, s")
-    ax.set_ylabel("tx/s")
-    ax.set_title("Throughput tracking (u_cmd vs u_ach)")
-    ax.legend()
-    out1 = os.path.join(args.outdir, f"{prefix}__throughput_timeseries.png")
-    save_fig(fig, out1, dpi=args.dpi)
-    maybe_copy(out1, paperdir)
+    specs.append({
+        "out": out("throughput_timeseries"), "figsize": (10, 4), "dpi": args.dpi,
+        "lines": [(*series["u_cmd"], "u_cmd"), (*series["u_ach"], "u_ach")],
+        "xlabel": "time, s", "ylabel": "tx/s", "title": "Throughput tracking (u_cmd vs u_ach)",
+    })
 
     # ---------- Plot 2: latency p99 timeseries ----------
-    lat = [x.lat_p99 if (x.lat_p99 is not None and x.lat_p99 > 0) else float("nan") for x in rows]
-    fig = plt.figure(figsize=(10, 4))
-    ax = fig.add_subplot(111)
-    ax.plot(t, lat, label="lat_p99")
-    ax.set_xlabel("time, s")
-    ax.set_ylabel("seconds")
-    ax.set_title("Confirmation latency p99 (observed)")
-    ax.legend()
-    out2 = os.path.join(args.outdir, f"{prefix}__lat_p99_timeseries.png")
-    save_fig(fig, out2, dpi=args.dpi)
-    maybe_copy(out2, paperdir)
+    specs.append({
+        "out": out("lat_p99_timeseries"), "figsize": (10, 4), "dpi": args.dpi,
+        "lines": [(*series["lat_p99"], "lat_p99")],
+        "xlabel": "time, s", "ylabel": "seconds", "title": "Confirmation latency p99 (observed)",
+    })
 
     # ---------- Step-level medians (for knee/scatter plots) ----------
-    segs = detect_segments_by_u_cmd(rows, min_seg_s=args.min_seg_s)
+    segs = segment_bounds(u_cmd, t, min_seg_s=args.min_seg_s)
     # If not step-like, treat as one segment
     if not segs:
-        segs = [rows]
+        segs = [(0, run.n)]
 
     lvl_u = []
     lvl_uach = []
     lvl_sat = []
     lvl_lat = []
 
-    for s in segs:
-        u = s[0].u_cmd
-        uachs = [x.u_ach for x in s if x.u_ach is not None and x.u_ach > 0]
-        lats = [x.lat_p99 for x in s if x.lat_p99 is not None and x.lat_p99 > 0]
+    u_ach, lat = run["u_ach"], run["lat_p99"]
+    for lo, hi in segs:
+        u = u_cmd[lo]
+        uachs, lats = QuantileSketch(), QuantileSketch()
+        for i in range(lo, hi):
+            if u_ach[i] > 0:
+                uachs.add(u_ach[i])
+            if lat[i] > 0:
+                lats.add(lat[i])
 
-        uach_med = median(uachs)
-        lat_med = median(lats)
+        uach_med = uachs.median()
+        lat_med = lats.median()
 
         sat_med = float("nan")
         if not math.isnan(uach_med) and u > 0:
@@ -261,40 +353,38 @@ def main():
         lvl_lat.append(lat_med)
 
     # ---------- Plot 3: u_cmd vs u_ach (segment medians) ----------
-    fig = plt.figure(figsize=(6, 5))
-    ax = fig.add_subplot(111)
-    ax.scatter(lvl_u, lvl_uach)
-    ax.set_xlabel("u_cmd, tx/s")
-    ax.set_ylabel("median u_ach, tx/s")
-    ax.set_title("u_cmd vs u_ach (segment medians)")
-    out3 = os.path.join(args.outdir, f"{prefix}__u_cmd_vs_u_ach.png")
-    save_fig(fig, out3, dpi=args.dpi)
-    maybe_copy(out3, paperdir)
+    specs.append({
+        "out": out("u_cmd_vs_u_ach"), "figsize": (6, 5), "dpi": args.dpi, "scatter": [(lvl_u, lvl_uach)],
+        "xlabel": "u_cmd, tx/s", "ylabel": "median u_ach, tx/s", "title": "u_cmd vs u_ach (segment medians)",
+    })
 
     # ---------- Plot 4: saturation vs u_cmd (segment medians) ----------
-    fig = plt.figure(figsize=(6, 5))
-    ax = fig.add_subplot(111)
-    ax.scatter(lvl_u, lvl_sat)
-    ax.set_xlabel("u_cmd, tx/s")
-    ax.set_ylabel("median saturation (u_ach/u_cmd)")
-    ax.set_title("Saturation vs u_cmd (segment medians)")
-    out4 = os.path.join(args.outdir, f"{prefix}__saturation_vs_u_cmd.png")
-    save_fig(fig, out4, dpi=args.dpi)
-    maybe_copy(out4, paperdir)
+    specs.append({
+        "out": out("saturation_vs_u_cmd"), "figsize": (6, 5), "dpi": args.dpi, "scatter": [(lvl_u, lvl_sat)],
+        "xlabel": "u_cmd, tx/s", "ylabel": "median saturation (u_ach/u_cmd)",
+        "title": "Saturation vs u_cmd (segment medians)",
+    })
 
     # Optional: also output latency vs u_cmd for paper diagnostics (small & useful)
-    fig = plt.figure(figsize=(6, 5))
-    ax = fig.add_subplot(111)
-    ax.scatter(lvl_u, lvl_lat)
-    ax.set_xlabel("u_cmd, tx/s")
-    ax.set_ylabel("median lat_p99, s")
-    ax.set_title("lat_p99 vs u_cmd (segment medians)")
-    out5 = os.path.join(args.outdir, f"{prefix}__lat_p99_vs_u_cmd.png")
-    save_fig(fig, out5, dpi=args.dpi)
-    maybe_copy(out5, paperdir)
+    specs.append({
+        "out": out("lat_p99_vs_u_cmd"), "figsize": (6, 5), "dpi": args.dpi, "scatter": [(lvl_u, lvl_lat)],
+        "xlabel": "u_cmd, tx/s", "ylabel": "median lat_p99, s", "title": "lat_p99 vs u_cmd (segment medians)",
+    })
+
+    write_series(os.path.join(args.outdir, f"{prefix}__series.csv"), series)
+    finish(specs, args, paperdir)
+
+def finish(specs: List[Dict], args, paperdir: Optional[str]) -> None:
+    if args.jobs == 1:
+        outs = [render(sp) for sp in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs or os.cpu_count() or 1, len(specs))) as ex:
+            outs = list(ex.map(render, specs))
+    for p in outs:
+        maybe_copy(p, paperdir)
 
     print("Wrote figures:")
-    for p in [out1, out2, out3, out4, out5]:
+    for p in outs:
         print("  " + p)
     if paperdir:
         print(f"Also copied to paperdir: {paperdir}")
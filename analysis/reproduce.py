@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# reproduce.py (stdlib only)
+#
+# Incremental rebuild of the analysis artifacts from data/raw:
+#   results/segments_*.csv        summarize_run.py per run
+#   data/processed/*.csv          build_processed_stdlib.py
+#   results/arx_model_<run>.json  fit_arx_stdlib.py on the processed knee run
+#   results/figures/*.png         make_plots.py per run, plus the campaign overlay
+#   paper/figures/*.png           copies of the figures the paper uses
+#
+# Each rule lists its input files, outputs and command. A rule is stale when
+# an output is missing or was changed by hand, or when the content of an
+# input, of the script (and the analysis modules it imports) or the command
+# line differs from the last successful build. Hashes go to
+# results/.reproduce_state.json, keyed by (size, mtime) so unchanged files
+# are not re-read. Stale rules run in parallel (--jobs) as soon as the rules
+# producing their inputs are done; nothing else is touched.
+#
+# results/arx_model.json is not in the graph: it was fitted on a processed
+# dataset that is not in the tree (sent_per_sec_reported -> y_lat_p99_sec),
+# so the rebuilt fit goes to its own file and the published model is left
+# alone.
+#
+# Usage:
+#   python3 analysis/reproduce.py                 # same as "all"
+#   python3 analysis/reproduce.py figures paper --jobs 4
+#   python3 analysis/reproduce.py --dry-run       # list stale rules only
+#   python3 analysis/reproduce.py --list
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from runload import file_sha256
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYSIS = "analysis"
+STATE = "results/.reproduce_state.json"
+
+# results/segments_<name>.csv <- data/raw/<run>.csv (extra summarize_run options)
+SEGMENTS = [
+    ("steady_low", "steady_low_2026-02-28_133431", []),
+    ("mid", "steady_mid_2026-02-28_183006", []),
+    ("steady_high", "steady_high_2026-02-28_135022", []),
+    ("high", "steady_high_sat_2026-02-28_185023", []),
+    ("high_3550", "steady_high_3550_2026-02-28_195846", []),
+    ("knee_2026-02-28", "knee_step_2026-02-16_172027", []),
+    ("knee_final", "knee_step_2026-02-28_191122", []),
+    ("knee_final_sat095", "knee_step_2026-02-28_191122", ["--sat-knee", "0.95"]),
+]
+# runs with results/figures, the ones the paper uses, and the ARX identification run
+FIGURE_RUNS = [
+    "knee_step_2026-02-28_191122",
+    "steady_low_2026-02-28_133431",
+    "steady_mid_2026-02-28_183006",
+    "steady_high_3550_2026-02-28_195846",
+]
+PAPER_RUNS = FIGURE_RUNS
+CAMPAIGN = ["steady_low", "mid", "steady_high", "high_3550", "knee_final"]
+ARX_RUN = "knee_step_2026-02-28_191122"
+ARX_ARGS = ["--na", "2", "--nb", "2", "--nk", "1", "--u_col", "u_ach", "--y_col", "lat_p99"]
+FIGURES = ["throughput_timeseries", "lat_p99_timeseries", "u_cmd_vs_u_ach", "saturation_vs_u_cmd",
+           "lat_p99_vs_u_cmd"]
+CAMPAIGN_FIGURES = ["saturation_vs_u_cmd", "lat_p99_vs_u_cmd", "lat_p99_timeseries"]
+
+
+@dataclass
+class Rule:
+    name: str
+    group: str
+    inputs: List[str]
+    outputs: List[str]
+    cmd: List[str] = field(default_factory=list)   # argv after the python interpreter; empty for copies
+    script: Optional[str] = None
+
+
+def build_rules() -> List[Rule]:
+    py = lambda script, *a: [os.path.join(ANALYSIS, script), *a]
+    raw = lambda run: f"data/raw/{run}.csv"
+    rules: List[Rule] = []
+    for name, run, extra in SEGMENTS:
+        out = f"results/segments_{name}.csv"
+        rules.append(Rule(f"segments:{name}", "segments", [raw(run)], [out],
+                          py("summarize_run.py", raw(run), "--out-segments-csv", out, *extra), "summarize_run.py"))
+
+    processed = f"data/processed/arx_dataset_{ARX_RUN}.csv"
+    rules.append(Rule(f"processed:{ARX_RUN}", "processed", [raw(ARX_RUN)], [processed],
+                      py("build_processed_stdlib.py", raw(ARX_RUN), processed), "build_processed_stdlib.py"))
+    arx_model = f"results/arx_model_{ARX_RUN}.json"
+    rules.append(Rule("arx", "arx", [processed], [arx_model],
+                      py("fit_arx_stdlib.py", processed, *ARX_ARGS, "--out_model", arx_model),
+                      "fit_arx_stdlib.py"))
+
+    for run in FIGURE_RUNS:
+        outs = [f"results/figures/{run}__{f}.png" for f in FIGURES] + [f"results/figures/{run}__series.csv"]
+        rules.append(Rule(f"figures:{run}", "figures", [raw(run)], outs,
+                          py("make_plots.py", raw(run), "--outdir", "results/figures", "--jobs", "1"),
+                          "make_plots.py"))
+    tables = [f"results/segments_{n}.csv" for n in CAMPAIGN]
+    series = [f"results/figures/{run}__series.csv" for run in FIGURE_RUNS]
+    rules.append(Rule("figures:campaign", "figures", tables + series,
+                      [f"results/figures/campaign__{f}.png" for f in CAMPAIGN_FIGURES],
+                      py("make_plots.py", "--campaign", *tables, "--series", *series,
+                         "--outdir", "results/figures", "--jobs", "1"), "make_plots.py"))
+
+    for run in PAPER_RUNS:
+        for f in FIGURES:
+            src = f"results/figures/{run}__{f}.png"
+            rules.append(Rule(f"paper:{run}__{f}", "paper", [src], [f"paper/figures/{run}__{f}.png"]))
+    return rules
+
+
+# ---- content hashes ------------------------------------------------------------
+
+class Hasher:
+    """SHA-256 of files, remembered by (size, mtime_ns) across builds."""
+
+    def __init__(self, cache: Dict[str, Dict]):
+        self.cache = cache
+
+    def __call__(self, path: str) -> Optional[str]:
+        try:
+            st = os.stat(os.path.join(ROOT, path))
+        except OSError:
+            return None
+        rec = self.cache.get(path)
+        if rec and rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns:
+            return rec["sha256"]
+        sha = file_sha256(os.path.join(ROOT, path))
+        self.cache[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+        return sha
+
+
+_IMPORT = re.compile(r"^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))", re.M)
+
+
+def script_deps(script: str) -> List[str]:
+    """The script and every analysis/ module it imports, transitively."""
+    seen: Set[str] = set()
+    todo = [script]
+    while todo:
+        s = todo.pop()
+        if s in seen:
+            continue
+        seen.add(s)
+        with open(os.path.join(ROOT, ANALYSIS, s), "r", encoding="utf-8") as f:
+            src = f.read()
+        for m in _IMPORT.finditer(src):
+            mod = (m.group(1) or m.group(2)) + ".py"
+            if os.path.exists(os.path.join(ROOT, ANALYSIS, mod)):
+                todo.append(mod)
+    return sorted(os.path.join(ANALYSIS, s) for s in seen)
+
+
+def fingerprint(rule: Rule, hasher: Hasher) -> Dict:
+    deps = script_deps(rule.script) if rule.script else []
+    return {"cmd": rule.cmd, "inputs": {p: hasher(p) for p in rule.inputs + deps}}
+
+
+def is_stale(rule: Rule, state: Dict, hasher: Hasher) -> Optional[str]:
+    """Reason the rule has to run, or None if its outputs are current."""
+    rec = state.get(rule.name)
+    if rec is None:
+        return "never built"
+    for p in rule.outputs:
+        h = hasher(p)
+        if h is None:
+            return f"missing {p}"
+        if h != rec["outputs"].get(p):
+            return f"{p} changed"
+    fp = fingerprint(rule, hasher)
+    if fp["cmd"] != rec["cmd"]:
+        return "command changed"
+    for p, h in fp["inputs"].items():
+        if h != rec["inputs"].get(p):
+            return f"{p} changed"
+    return None
+
+
+# ---- execution -----------------------------------------------------------------
+
+def run_rule(rule: Rule) -> str:
+    for p in rule.outputs:
+        os.makedirs(os.path.join(ROOT, os.path.dirname(p)), exist_ok=True)
+    if not rule.cmd:
+        src, dst = (os.path.join(ROOT, p) for p in (rule.inputs[0], rule.outputs[0]))
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+        return ""
+    res = subprocess.run([sys.executable, *rule.cmd], cwd=ROOT, stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(f"exit {res.returncode}\n{res.stdout}")
+    return res.stdout
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rebuild stale analysis artifacts (results/, paper/figures/).")
+    ap.add_argument("targets", nargs="*", default=["all"],
+                    help="all, or groups (segments processed arx figures paper) / rule names")
+    ap.add_argument("--jobs", type=int, default=0, help="parallel rules (0 = all cores)")
+    ap.add_argument("--dry-run", action="store_true", help="show stale rules, run nothing")
+    ap.add_argument("--force", action="store_true", help="rebuild the selected rules even if current")
+    ap.add_argument("--list", action="store_true", help="list rules and exit")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print the output of every rule")
+    args = ap.parse_args()
+
+    rules = build_rules()
+    if args.list:
+        for r in rules:
+            print(f"{r.name:<52} {' '.join(r.outputs)}")
+        return
+
+    by_output = {p: r for r in rules for p in r.outputs}
+    wanted: Set[str] = set()
+    for t in args.targets:
+        sel = [r for r in rules if t == "all" or r.group == t or r.name == t]
+        if not sel:
+            raise SystemExit(f"ERROR: unknown target {t!r} (see --list)")
+        wanted.update(r.name for r in sel)
+    # upstream rules come along, so a target is never built from stale inputs
+    todo = [r for r in rules if r.name in wanted]
+    while todo:
+        r = todo.pop()
+        for p in r.inputs:
+            up = by_output.get(p)
+            if up is not None and up.name not in wanted:
+                wanted.add(up.name)
+                todo.append(up)
+    selected = [r for r in rules if r.name in wanted]
+
+    state_path = os.path.join(ROOT, STATE)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    rule_state: Dict[str, Dict] = state.setdefault("rules", {})
+    hasher = Hasher(state.setdefault("hashes", {}))
+
+    def save_state() -> None:
+        tmp = state_path + ".tmp"
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp, state_path)
+
+    missing = [p for r in selected for p in r.inputs
+               if p not in by_output and not os.path.exists(os.path.join(ROOT, p))]
+    if missing:
+        raise SystemExit(f"ERROR: missing inputs: {' '.join(sorted(set(missing)))}")
+
+    if args.dry_run:
+        n = 0
+        for r in selected:
+            why = "forced" if args.force else is_stale(r, rule_state, hasher)
+            if why:
+                print(f"stale  {r.name}: {why}")
+                n += 1
+        print(f"{n} of {len(selected)} rules stale")
+        save_state()
+        return
+
+    # schedule: a rule is decided (skip or run) once every rule producing its inputs has finished
+    pending = {r.name: r for r in selected}
+    producers = {r.name: {by_output[p].name for p in r.inputs if p in by_output and by_output[p].name in pending}
+                 for r in selected}
+    done: Set[str] = set()
+    failed: Set[str] = set()
+    ran = skipped = 0
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1) as ex:
+        running = {}
+        while pending or running:
+            for name in [n for n in pending if producers[n] <= done | failed]:
+                r = pending.pop(name)
+                if producers[name] & failed:
+                    print(f"skip   {name}: upstream failed")
+                    failed.add(name)
+                    continue
+                why = "forced" if args.force else is_stale(r, rule_state, hasher)
+                if not why:
+                    skipped += 1
+                    done.add(name)
+                    continue
+                print(f"build  {name}: {why}", flush=True)
+                running[ex.submit(run_rule, r)] = r
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                r = running.pop(fut)
+                try:
+                    out = fut.result()
+                except Exception as e:
+                    print(f"FAILED {r.name}: {e}", file=sys.stderr)
+                    failed.add(r.name)
+                    continue
+                if args.verbose and out:
+                    print(out, end="")
+                rec = fingerprint(r, hasher)
+                rec["outputs"] = {p: hasher(p) for p in r.outputs}
+                if None in rec["outputs"].values():
+                    print(f"FAILED {r.name}: did not write {[p for p, h in rec['outputs'].items() if h is None]}",
+                          file=sys.stderr)
+                    failed.add(r.name)
+                    continue
+                rule_state[r.name] = rec
+                save_state()
+                done.add(r.name)
+                ran += 1
+
+    save_state()
+    print(f"{ran} rebuilt, {skipped} up to date, {len(failed)} failed ({time.monotonic() - t0:.1f}s)")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
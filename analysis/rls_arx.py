@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# rls_arx.py (stdlib only)
+#
+# Recursive least squares ARX(na, nb, nk) estimator with exponential
+# forgetting: O((na+nb)^2) work per sample, no refit. Same model and
+# regressor convention as fit_arx_stdlib.py,
+#   y[k] + a1 y[k-1] + ... + a_na y[k-na] = b1 u[k-nk] + ... + b_nb u[k-nk-nb+1] + e[k]
+# and the same arx_model.json format (plus "forgetting" and "estimator").
+#
+# Update per sample, phi = [-y[k-1..k-na], u[k-nk..k-nk-nb+1]]:
+#   e     = y[k] - phi' theta              (a-priori error)
+#   g     = P phi / (lam + phi' P phi)
+#   theta = theta + g e
+#   P     = (P - g phi' P) / lam
+# P starts at I/ridge, i.e. the batch fit's ridge, fading with lam. While the
+# input is not exciting (a long constant level) P would grow without bound,
+# so the 1/lam inflation stops once trace(P) exceeds its initial value.
+#
+# A sample with a missing/non-finite u or y (or a RESUME marker row) clears
+# the lag history: regressors never straddle a gap.
+#
+# The collector runs it live with --rls (scripts/collect_csv.py); this
+# script replays a CSV, or a stream on stdin:
+#   python3 analysis/rls_arx.py data/processed/arx_dataset_knee.csv --na 2 --nb 2 --nk 1 --lam 0.995
+#   tail -n +1 -f data/raw/run.csv | python3 analysis/rls_arx.py - --u_col u_ach --y_col lat_p99 \
+#       --out_model results/arx_rls.json --every 30
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from collections import deque
+from typing import Dict, List, Optional
+
+from runbin import open_maybe_gz
+
+
+class RLSARX:
+    def __init__(self, na: int, nb: int, nk: int, lam: float = 0.995, ridge: float = 1e-6,
+                 u_col: str = "u", y_col: str = "y"):
+        if nb < 1:
+            raise SystemExit("nb must be >= 1")
+        if na < 0 or nk < 0:
+            raise SystemExit("na, nb, nk must be >= 0")
+        if not 0.0 < lam <= 1.0:
+            raise SystemExit("forgetting factor must be in (0, 1]")
+        if ridge <= 0.0:
+            raise SystemExit("ridge must be > 0 (P starts at I/ridge)")
+        self.na, self.nb, self.nk = na, nb, nk
+        self.lam = lam
+        self.ridge = ridge
+        self.u_col, self.y_col = u_col, y_col
+        self.maxlag = max(na, nk + nb - 1)
+
+        p = na + nb
+        self.theta = [0.0] * p
+        self.P = [[(1.0 / ridge if i == j else 0.0) for j in range(p)] for i in range(p)]
+        self.trace_max = p / ridge
+        # newest first; y needs na past values, u needs nk+nb-1 past values plus u[k]
+        self.yh: deque = deque(maxlen=max(na, 1))
+        self.uh: deque = deque(maxlen=nk + nb)
+        self.n_seen = 0
+        self.n_used = 0
+        self.err_sq = 0.0   # exponentially weighted a-priori error energy
+        self.err_w = 0.0
+
+    def reset_history(self) -> None:
+        self.yh.clear()
+        self.uh.clear()
+
+    def update(self, u: Optional[float], y: Optional[float]) -> Optional[float]:
+        """Feed one (u[k], y[k]) pair; returns the a-priori error, or None while the lags fill."""
+        if u is None or y is None or not (math.isfinite(u) and math.isfinite(y)):
+            self.reset_history()
+            return None
+        self.n_seen += 1
+        self.uh.appendleft(u)
+        e = None
+        if len(self.uh) == self.uh.maxlen and (self.na == 0 or len(self.yh) == self.na):
+            phi = [-v for v in list(self.yh)[:self.na]] + list(self.uh)[self.nk:self.nk + self.nb]
+            e = self._step(phi, y)
+        if self.na:
+            self.yh.appendleft(y)
+        return e
+
+    def _step(self, phi: List[float], y: float) -> float:
+        P, th, lam = self.P, self.theta, self.lam
+        p = len(phi)
+        Pphi = [sum(P[i][j] * phi[j] for j in range(p)) for i in range(p)]
+        denom = lam + sum(phi[i] * Pphi[i] for i in range(p))
+        e = y - sum(phi[i] * th[i] for i in range(p))
+        g = [v / denom for v in Pphi]
+        for i in range(p):
+            th[i] += g[i] * e
+        # P symmetric, so phi'P = Pphi'; keep it symmetric against rounding drift
+        trace = sum(P[i][i] - g[i] * Pphi[i] for i in range(p))
+        scale = 1.0 / lam if trace < self.trace_max else 1.0
+        for i in range(p):
+            gi = g[i]
+            Pi = P[i]
+            for j in range(i, p):
+                v = (Pi[j] - gi * Pphi[j]) * scale
+                Pi[j] = v
+                P[j][i] = v
+        self.n_used += 1
+        self.err_sq = lam * self.err_sq + e * e
+        self.err_w = lam * self.err_w + 1.0
+        return e
+
+    def model(self) -> Dict:
+        return {
+            "na": self.na,
+            "nb": self.nb,
+            "nk": self.nk,
+            "u_col": self.u_col,
+            "y_col": self.y_col,
+            "ridge": self.ridge,
+            "rmse_sec": math.sqrt(self.err_sq / self.err_w) if self.err_w else None,
+            "a": self.theta[:self.na],
+            "b": self.theta[self.na:],
+            "n_used": self.n_used,
+            "maxlag": self.maxlag,
+            "forgetting": self.lam,
+            "estimator": "rls",
+        }
+
+    def snapshot(self, path: str, **extra) -> None:
+        """Atomically (re)write the model JSON, so readers never see a partial file."""
+        model = self.model()
+        model.update(extra)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(model, f, indent=2)
+        os.replace(tmp, path)
+
+
+def to_float(s: Optional[str]) -> Optional[float]:
+    if s is None:
+        return None
+    s = s.strip()
+    if s == "" or s.lower() in ("nan", "none", "null"):
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Recursive least squares ARX over a CSV (or stdin with '-').")
+    ap.add_argument("csv", help="input csv with header row; '-' reads stdin")
+    ap.add_argument("--na", type=int, default=2)
+    ap.add_argument("--nb", type=int, default=2)
+    ap.add_argument("--nk", type=int, default=1)
+    ap.add_argument("--u_col", default="sent_per_sec_reported", help="input column name (u)")
+    ap.add_argument("--y_col", default="y_lat_p99_sec", help="output column name (y)")
+    ap.add_argument("--lam", type=float, default=0.995,
+                    help="forgetting factor; memory ~ 1/(1-lam) samples (1 = ordinary least squares)")
+    ap.add_argument("--ridge", type=float, default=1e-6, help="initial P = I/ridge")
+    ap.add_argument("--every", type=int, default=0, help="snapshot --out_model every N updates (0 = at the end)")
+    ap.add_argument("--out_model", default="arx_model.json", help="output JSON model path")
+    args = ap.parse_args()
+
+    rls = RLSARX(args.na, args.nb, args.nk, lam=args.lam, ridge=args.ridge, u_col=args.u_col, y_col=args.y_col)
+    f = sys.stdin if args.csv == "-" else open_maybe_gz(args.csv)
+    try:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise SystemExit("ERROR: empty input")
+        header = [h.strip() for h in header]
+        for c in (args.u_col, args.y_col):
+            if c not in header:
+                raise SystemExit(f"ERROR: column {c!r} not in header {header}")
+        iu, iy = header.index(args.u_col), header.index(args.y_col)
+        need = max(iu, iy)
+        for row in reader:
+            if len(row) <= need:
+                rls.reset_history()
+                continue
+            if rls.update(to_float(row[iu]), to_float(row[iy])) is not None and args.every \
+                    and rls.n_used % args.every == 0:
+                rls.snapshot(args.out_model)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+    if rls.n_used == 0:
+        raise SystemExit(f"No usable samples (read {rls.n_seen}, need > {rls.maxlag} consecutive)")
+    rls.snapshot(args.out_model)
+    m = rls.model()
+    print(f"RLS ARX OK (lam={args.lam:g})")
+    print(f"  N_used = {m['n_used']}")
+    print(f"  na={args.na} nb={args.nb} nk={args.nk}")
+    print(f"  RMSE (a-priori, weighted) = {m['rmse_sec']:.6f} s")
+    print("  a =", m["a"])
+    print("  b =", m["b"])
+    print(f"Saved model -> {args.out_model}")
+
+
+if __name__ == "__main__":
+    main()
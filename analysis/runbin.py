@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# runbin.py (stdlib only)
+#
+# Fixed-schema columnar binary run format, written by scripts/collect_csv.py
+# (--bin-out) or converted from a raw CSV, and read back via mmap.
+#
+# Layout (little-endian):
+#   8 bytes   magic b"SRUNBIN1"
+#   8 bytes   uint64 header length H
+#   H bytes   JSON header, space-padded to a multiple of 8:
+#             {"version": 1, "n_rows": N, "meta": {...},
+#              "columns": [{"name": "t_sec", "dtype": "f8", "offset": ...}, ...]}
+#   then one contiguous N*8-byte block per column at its offset.
+#
+# f8 columns hold NaN for missing values; i8 columns (sent_total) hold
+# INT_MISSING. Canonical columns follow data/SCHEMA.md; any other numeric
+# column (tick_lag, lat_p50, ...) is kept as f8.
+#
+# Usage:
+#   python3 analysis/runbin.py to-bin data/raw/knee_step_2026-02-28_191122.csv
+#   python3 analysis/runbin.py info data/raw/knee_step_2026-02-28_191122.runbin
+
+import argparse
+import csv
+import gzip
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+MAGIC = b"SRUNBIN1"
+VERSION = 1
+INT_MISSING = -(2 ** 63)
+NAN = float("nan")
+
+# canonical raw-log columns (data/SCHEMA.md), in file order
+SCHEMA: List[Tuple[str, str]] = [
+    ("t_sec", "f8"),
+    ("u_cmd", "f8"),
+    ("sent_total", "i8"),
+    ("u_ach", "f8"),
+    ("lat_p99", "f8"),
+    ("inflight", "f8"),
+    ("err_per_sec", "f8"),
+]
+
+# header aliases for every raw-log variant (data/README.md, data/SCHEMA.md);
+# the first match wins, so computed throughput is preferred over reported
+ALIASES = {
+    "t_sec": ["t_sec", "t", "time_sec"],
+    "u_cmd": ["u_cmd", "lam_cmd", "lambda", "target_lambda", "rate"],
+    "sent_total": ["sent_total", "sent", "total_sent", "sent_ok_total", "ok_total"],
+    "u_ach": ["u_ach", "u_ach(sent_calc)", "u_ach_from_total", "u_ach_reported", "ach", "throughput",
+              "sent_per_sec", "sent_per_sec_reported"],
+    "lat_p99": ["lat_p99", "y_lat_p99_sec", "lat_p99_sec", "p99", "latency_p99", "tx_lat_p99"],
+    "inflight": ["inflight", "in_flight"],
+    "err_per_sec": ["err_per_sec", "err_per_sec_reported", "errors_per_sec", "errRate"],
+}
+
+_TYPECODE = {"f8": "d", "i8": "q"}
+
+
+def is_runbin(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class ColumnWriter:
+    """Accumulates rows into typed arrays and writes them as one runbin file."""
+
+    def __init__(self, columns: List[Tuple[str, str]]):
+        self.columns = list(columns)
+        self.arrays: Dict[str, array] = {name: array(_TYPECODE[dt]) for name, dt in self.columns}
+
+    def __len__(self) -> int:
+        return len(self.arrays[self.columns[0][0]]) if self.columns else 0
+
+    def append(self, values: Dict[str, Optional[float]]) -> None:
+        for name, dt in self.columns:
+            v = values.get(name)
+            if dt == "i8":
+                self.arrays[name].append(INT_MISSING if v is None else int(v))
+            else:
+                self.arrays[name].append(NAN if v is None else float(v))
+
+    def write(self, path: str, meta: Optional[Dict] = None) -> None:
+        write_columns(path, self.columns, self.arrays, meta)
+
+
+def write_columns(path: str, columns: List[Tuple[str, str]], arrays: Dict[str, array],
+                  meta: Optional[Dict] = None) -> None:
+    n = len(arrays[columns[0][0]]) if columns else 0
+    for name, _ in columns:
+        if len(arrays[name]) != n:
+            raise ValueError(f"column {name} has {len(arrays[name])} rows, expected {n}")
+
+    def header_bytes(offsets: List[int]) -> bytes:
+        hdr = {
+            "version": VERSION,
+            "n_rows": n,
+            "meta": meta or {},
+            "columns": [{"name": name, "dtype": dt, "offset": off}
+                        for (name, dt), off in zip(columns, offsets)],
+        }
+        raw = json.dumps(hdr, separators=(",", ":")).encode("utf-8")
+        return raw + b" " * (-len(raw) % 8)
+
+    # offsets depend on the header length, which depends on the offsets:
+    # iterate until the padded length is stable (normally twice)
+    offsets = [0] * len(columns)
+    hdr = header_bytes(offsets)
+    while True:
+        base = len(MAGIC) + 8 + len(hdr)
+        offsets = [base + i * n * 8 for i in range(len(columns))]
+        new_hdr = header_bytes(offsets)
+        if len(new_hdr) == len(hdr):
+            hdr = new_hdr
+            break
+        hdr = new_hdr
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(hdr)))
+        f.write(hdr)
+        for name, _ in columns:
+            a = arrays[name]
+            if sys.byteorder != "little":
+                a = array(a.typecode, a)
+                a.byteswap()
+            a.tofile(f)
+    os.replace(tmp, path)
+
+
+class RunFile:
+    """
+    Memory-mapped runbin reader. rf["u_ach"] is a zero-copy memoryview
+    (format 'd' or 'q') over the file; nothing is parsed per row.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            size = os.fstat(self._f.fileno()).st_size
+            if size < len(MAGIC) + 8:
+                raise ValueError(f"{path}: not a runbin file")
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._f.close()
+            raise
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a runbin file")
+        (hlen,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        hdr = json.loads(bytes(self._mm[start:start + hlen]).decode("utf-8"))
+        if hdr.get("version") != VERSION:
+            self.close()
+            raise ValueError(f"{path}: unsupported runbin version {hdr.get('version')}")
+
+        self.n_rows: int = hdr["n_rows"]
+        self.meta: Dict = hdr.get("meta", {})
+        self.dtypes: Dict[str, str] = {}
+        self._views: Dict[str, memoryview] = {}
+        buf = memoryview(self._mm)
+        for c in hdr["columns"]:
+            off = c["offset"]
+            raw = buf[off:off + self.n_rows * 8]
+            self.dtypes[c["name"]] = c["dtype"]
+            if sys.byteorder == "little":
+                self._views[c["name"]] = raw.cast(_TYPECODE[c["dtype"]])
+            else:
+                a = array(_TYPECODE[c["dtype"]], raw.tobytes())
+                a.byteswap()
+                self._views[c["name"]] = memoryview(a)
+            raw.release()
+        buf.release()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._views.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._views
+
+    def __getitem__(self, name: str) -> memoryview:
+        return self._views[name]
+
+    def close(self) -> None:
+        for v in getattr(self, "_views", {}).values():
+            v.release()
+        self._views = {}
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __enter__(self) -> "RunFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_maybe_gz(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, "r", newline="")
+
+
+def pick_col(fieldnames: List[str], keys: List[str]) -> Optional[str]:
+    exact = {h.strip(): h.strip() for h in fieldnames}
+    for k in keys:
+        if k in exact:
+            return k
+    lower = {h.strip().lower(): h.strip() for h in fieldnames}
+    for k in keys:
+        lk = k.lower()
+        if lk in lower:
+            return lower[lk]
+    return None
+
+
+def csv_to_runbin(csv_path: str, out_path: str) -> int:
+    """Convert a raw CSV (canonical names or aliases) to runbin; returns rows written."""
+    with open_maybe_gz(csv_path) as f:
+        r = csv.reader(f)
+        header = next(r, None)
+        if header is None:
+            raise SystemExit("ERROR: no header found")
+        header = [h.strip() for h in header]
+
+        src: Dict[str, int] = {}
+        for name, _ in SCHEMA:
+            col = pick_col(header, ALIASES[name])
+            if col is not None:
+                src[name] = header.index(col)
+        if "t_sec" not in src or "u_cmd" not in src:
+            raise SystemExit("ERROR: need t_sec and u_cmd (or aliases)")
+        used = set(src.values())
+        extra = [(h, i) for i, h in enumerate(header) if i not in used and h != "t_iso"]
+
+        canon = [(name, dt) for name, dt in SCHEMA if name in src]
+        arrays: Dict[str, array] = {name: array(_TYPECODE[dt]) for name, dt in canon}
+        extra_arrays: Dict[str, array] = {h: array("d") for h, _ in extra}
+        non_numeric = set()
+
+        n = 0
+        for row in r:
+            if not row:
+                continue
+            for name, dt in canon:
+                i = src[name]
+                x = row[i].strip() if i < len(row) else ""
+                try:
+                    v = float(x) if x else NAN
+                except ValueError:
+                    v = NAN
+                if dt == "i8":
+                    arrays[name].append(INT_MISSING if math.isnan(v) or math.isinf(v) else int(v))
+                else:
+                    arrays[name].append(v)
+            for h, i in extra:
+                x = row[i].strip() if i < len(row) else ""
+                try:
+                    v = float(x) if x else NAN
+                except ValueError:
+                    v = NAN
+                    non_numeric.add(h)
+                extra_arrays[h].append(v)
+            n += 1
+
+    columns = canon + [(h, "f8") for h, _ in extra if h not in non_numeric]
+    arrays.update({h: a for h, a in extra_arrays.items() if h not in non_numeric})
+    write_columns(out_path, columns, arrays, meta={"source": os.path.basename(csv_path)})
+    return n
+
+
+def default_out_path(csv_path: str) -> str:
+    base = csv_path
+    for suf in (".csv.gz", ".csv"):
+        if base.endswith(suf):
+            base = base[: -len(suf)]
+            break
+    return base + ".runbin"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Columnar binary run files: convert from CSV and inspect.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tb = sub.add_parser("to-bin", help="convert a raw CSV (or .csv.gz) to runbin")
+    tb.add_argument("csv_path")
+    tb.add_argument("out_path", nargs="?", default="", help="default: CSV path with .runbin suffix")
+    inf = sub.add_parser("info", help="print header and column ranges of a runbin file")
+    inf.add_argument("path")
+    args = ap.parse_args()
+
+    if args.cmd == "to-bin":
+        out = args.out_path or default_out_path(args.csv_path)
+        n = csv_to_runbin(args.csv_path, out)
+        print(f"Wrote {n} rows -> {out}")
+        return
+
+    with RunFile(args.path) as rf:
+        print(f"file: {args.path}")
+        print(f"rows: {rf.n_rows}")
+        if rf.meta:
+            print(f"meta: {json.dumps(rf.meta)}")
+        for name in rf.columns:
+            col = rf[name]
+            if rf.dtypes[name] == "i8":
+                vals = [x for x in col if x != INT_MISSING]
+            else:
+                vals = [x for x in col if not math.isnan(x)]
+            rng = f"{min(vals)} .. {max(vals)}" if vals else "(empty)"
+            print(f"  {name:<14} {rf.dtypes[name]}  missing={rf.n_rows - len(vals):<6d} range={rng}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+# runload.py (stdlib only; NumPy views when it is installed)
+#
+# Shared run loader for the analysis scripts. Column aliases are resolved
+# once from the header, the file is parsed in one pass into one array('d')
+# per column (8 bytes per value, NaN for missing), and u_ach is filled from
+# Δsent_total/Δt in the same pass where the log has no value for it.
+#
+# Reads raw CSVs (canonical names or any alias in runbin.ALIASES), .csv.gz,
+# and runbin files (analysis/runbin.py). CSVs are parsed once and kept in a
+# content-hashed cache of binary columns shared by every analysis script.
+#
+#   from runload import load_run, segment_bounds
+#   run = load_run("data/raw/knee_step_2026-02-28_191122.csv")
+#   run["u_ach"][i], run.n, run.source["lat_p99"]
+#
+# RunStream is the row-at-a-time counterpart (same row filter and u_ach
+# fill) for callers that must not hold the whole run in memory:
+#
+#   for t, u, sent, u_ach in RunStream(path, ("t_sec", "u_cmd", "sent_total", "u_ach")): ...
+
+import contextlib
+import csv
+import hashlib
+import json
+import math
+import os
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from runbin import ALIASES, INT_MISSING, RunFile, is_runbin, open_maybe_gz, pick_col, write_columns
+
+try:
+    import numpy as _np
+except ImportError:  # optional
+    _np = None
+
+try:
+    import fcntl as _fcntl
+except ImportError:  # not on Windows; the cache index is then unlocked
+    _fcntl = None
+
+NAN = float("nan")
+
+# canonical fields, in the order of data/SCHEMA.md
+FIELDS: List[str] = list(ALIASES.keys())
+
+
+def isnan(x: float) -> bool:
+    return x != x
+
+
+class RunColumns:
+    """
+    Struct-of-arrays view of one run: run["t_sec"] is an array('d') with one
+    entry per kept row. source maps each requested field to the header
+    column it was read from (None if the file has no such column; the array
+    is then all NaN). derived counts u_ach values filled from sent_total.
+    """
+
+    def __init__(self, path: str, cols: Dict[str, array], source: Dict[str, Optional[str]], derived: int = 0):
+        self.path = path
+        self.cols = cols
+        self.source = source
+        self.derived = derived
+
+    @property
+    def n(self) -> int:
+        return len(next(iter(self.cols.values()))) if self.cols else 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.cols
+
+    def __getitem__(self, name: str) -> array:
+        return self.cols[name]
+
+    def has(self, name: str) -> bool:
+        """True if the field came from a column in the file (or was derived)."""
+        return self.source.get(name) is not None
+
+    def np(self, name: str):
+        """Zero-copy float64 NumPy view of a column (requires NumPy)."""
+        if _np is None:
+            raise SystemExit("ERROR: NumPy is not installed")
+        return _np.frombuffer(self.cols[name], dtype=_np.float64)
+
+    def sort_by(self, name: str) -> None:
+        """Reorder every column by one of them (stable; no-op if already sorted)."""
+        key = self.cols[name]
+        order = sorted(range(self.n), key=key.__getitem__)
+        if any(i != j for i, j in enumerate(order)):
+            for c, a in self.cols.items():
+                self.cols[c] = array("d", (a[i] for i in order))
+
+    def valid(self, name: str, lo: Optional[float] = None) -> List[float]:
+        """Non-missing values of a column, optionally only those > lo."""
+        a = self.cols[name]
+        if lo is None:
+            return [x for x in a if x == x]
+        return [x for x in a if x > lo]
+
+
+def _to_float(x: str) -> float:
+    try:
+        return float(x)
+    except ValueError:
+        return NAN
+
+
+def _plan(header: List[str], fields: Iterable[str], raw: Iterable[str],
+          require: Sequence[str]) -> Dict[str, Optional[str]]:
+    source: Dict[str, Optional[str]] = {}
+    for name in fields:
+        source[name] = pick_col(header, ALIASES.get(name, [name]))
+    missing = [c for c in raw if c not in header]
+    if missing:
+        raise SystemExit(f"ERROR: missing columns: {missing}. Available: {header}")
+    for c in raw:
+        source[c] = c
+    if any(source.get(n) is None for n in require):
+        raise SystemExit(f"ERROR: need {', '.join(require)} (or aliases)")
+    return source
+
+
+class _Builder:
+    """Appends kept rows and derives u_ach on the fly."""
+
+    def __init__(self, names: List[str], require: Sequence[str], derive: bool, nonpositive: bool = False):
+        self.names = names
+        self.cols: Dict[str, array] = {n: array("d") for n in names}
+        self.req = [names.index(n) for n in require]
+        self.derive = derive
+        self.nonpositive = nonpositive
+        self.i_t = names.index("t_sec") if "t_sec" in names else -1
+        self.i_sent = names.index("sent_total") if "sent_total" in names else -1
+        self.i_uach = names.index("u_ach") if "u_ach" in names else -1
+        self.appends = [self.cols[n].append for n in names]
+        self.prev_t = NAN
+        self.prev_sent = NAN
+        self.derived = 0
+
+    def add(self, vals: List[float]) -> None:
+        if self.keep(vals):
+            for app, v in zip(self.appends, vals):
+                app(v)
+
+    def keep(self, vals: List[float]) -> bool:
+        """Row filter and u_ach fill (in place); False if the row is dropped."""
+        for i in self.req:
+            v = vals[i]
+            if v != v or v in (math.inf, -math.inf):
+                return False
+        if self.derive:
+            t = vals[self.i_t]
+            sent = vals[self.i_sent]
+            if sent == sent and t == t:
+                u = vals[self.i_uach]
+                if (u != u or (self.nonpositive and u <= 0)) and self.prev_sent == self.prev_sent:
+                    dt = t - self.prev_t
+                    ds = sent - self.prev_sent
+                    if dt > 0 and ds >= 0:
+                        vals[self.i_uach] = ds / dt
+                        self.derived += 1
+                self.prev_t = t
+                self.prev_sent = sent
+        return True
+
+
+def _bin_header(rf: RunFile) -> List[str]:
+    # cache entries keep the source CSV header (all-empty columns are not stored)
+    return rf.meta.get("header") or rf.columns
+
+
+def resolve_columns(path: str, fields: Sequence[str] = FIELDS) -> Dict[str, Optional[str]]:
+    """Header-only: which column each field would be read from (None if absent)."""
+    if is_runbin(path):
+        with RunFile(path) as rf:
+            header = _bin_header(rf)
+    else:
+        with open_maybe_gz(path) as f:
+            header = next(csv.reader(f), None)
+        if header is None:
+            raise SystemExit("ERROR: no header found")
+        header = [h.strip() for h in header]
+    return {name: pick_col(header, ALIASES.get(name, [name])) for name in fields}
+
+
+# ---- parsed-run cache ------------------------------------------------------
+#
+# Every CSV loaded through load_run() is parsed once into a runbin file of
+# float64 columns under the cache directory, named by the SHA-256 of its
+# content. index.json maps absolute path -> (size, mtime_ns, sha256), so an
+# unchanged file is found without re-hashing. Entries are evicted least
+# recently used first (entry mtime is the LRU clock) once the directory
+# exceeds RUNLOAD_CACHE_MB, and their index records go with them. Every
+# read-modify-write of index.json and every eviction holds an flock on
+# index.lock, so concurrent loaders (summarize_run --jobs) do not lose
+# each other's records.
+#
+#   RUNLOAD_CACHE=0        disable
+#   RUNLOAD_CACHE_DIR      default $XDG_CACHE_HOME/solana-siso-mpc-testbed/runs
+#   RUNLOAD_CACHE_MB       size limit, default 1024
+
+CACHE_VERSION = 1
+
+
+def cache_dir() -> Optional[str]:
+    if os.environ.get("RUNLOAD_CACHE", "1").strip().lower() in ("0", "no", "off", "false"):
+        return None
+    d = os.environ.get("RUNLOAD_CACHE_DIR", "").strip()
+    if not d:
+        base = os.environ.get("XDG_CACHE_HOME", "").strip() or os.path.join(os.path.expanduser("~"), ".cache")
+        d = os.path.join(base, "solana-siso-mpc-testbed", "runs")
+    return d
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 hex digest of a file's content (read in 1 MiB chunks)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def _index_lock(d: str):
+    """Exclusive lock on the cache index (no-op without fcntl)."""
+    with open(os.path.join(d, "index.lock"), "a") as f:
+        if _fcntl is not None:
+            _fcntl.flock(f.fileno(), _fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if _fcntl is not None:
+                _fcntl.flock(f.fileno(), _fcntl.LOCK_UN)
+
+
+def _read_index(d: str) -> Dict[str, Dict]:
+    try:
+        with open(os.path.join(d, "index.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(d: str, idx: Dict[str, Dict]) -> None:
+    tmp = os.path.join(d, f"index.json.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(idx, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(d, "index.json"))
+
+
+def _parse_csv_all(path: str) -> Tuple[List[str], Dict[str, array]]:
+    """Every column of a CSV as float64 (NaN where empty or not a number)."""
+    with open_maybe_gz(path) as f:
+        r = csv.reader(f)
+        header = next(r, None)
+        if header is None:
+            raise SystemExit("ERROR: no header found")
+        header = [h.strip() for h in header]
+        arrays = [array("d") for _ in header]
+        appends = [a.append for a in arrays]
+        width = len(header)
+        conv = _to_float
+        for row in r:
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            for app, x in zip(appends, row):
+                app(conv(x))
+    return header, dict(zip(header, arrays))
+
+
+def _evict(d: str, limit: int, keep: str) -> List[str]:
+    """Remove least recently used entries until d fits in limit; returns their SHA-256s."""
+    entries = []
+    for name in os.listdir(d):
+        if name.endswith(".runbin"):
+            p = os.path.join(d, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+    total = sum(e[1] for e in entries)
+    gone: List[str] = []
+    for _, size, p in sorted(entries):
+        if total <= limit:
+            break
+        if p == keep:
+            continue
+        try:
+            os.remove(p)
+            total -= size
+            gone.append(os.path.basename(p).split(".", 1)[0])
+        except OSError:
+            pass
+    return gone
+
+
+def cached_runbin(path: str, create: bool = True) -> Optional[str]:
+    """Cache entry for a CSV, parsing it on a miss (create=False: None on a miss);
+    None if the cache is off or unusable."""
+    d = cache_dir()
+    if d is None:
+        return None
+    try:
+        os.makedirs(d, exist_ok=True)
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with _index_lock(d):
+            rec = _read_index(d).get(key)
+        if rec and rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+            sha = rec["sha256"]
+        else:
+            sha = file_sha256(path)  # outside the lock: hashing a large file is slow
+            with _index_lock(d):
+                idx = _read_index(d)
+                idx[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+                _write_index(d, idx)
+        entry = os.path.join(d, f"{sha}.v{CACHE_VERSION}.runbin")
+        with _index_lock(d):
+            if os.path.exists(entry):
+                os.utime(entry)
+                return entry
+        if not create:
+            return None
+
+        header, arrays = _parse_csv_all(path)
+        stored = [h for h in dict.fromkeys(header) if any(x == x for x in arrays[h])]
+        tmp = f"{entry}.{os.getpid()}"
+        write_columns(tmp, [(h, "f8") for h in stored], arrays,
+                      meta={"source": key, "sha256": sha, "header": header})
+        limit = int(float(os.environ.get("RUNLOAD_CACHE_MB", "1024")) * 1024 * 1024)
+        with _index_lock(d):
+            os.replace(tmp, entry)
+            gone = set(_evict(d, limit, keep=entry))
+            if gone:
+                idx = _read_index(d)
+                _write_index(d, {k: r for k, r in idx.items() if r.get("sha256") not in gone})
+        return entry
+    except OSError:
+        return None
+
+
+# ---- loading ---------------------------------------------------------------
+
+def _fill_u_ach(run: RunColumns, nonpositive: bool) -> int:
+    """Fill u_ach from Δsent_total/Δt between consecutive rows; returns the count filled."""
+    t, sent, u = run["t_sec"], run["sent_total"], run["u_ach"]
+    prev_t = prev_sent = NAN
+    derived = 0
+    for i in range(len(t)):
+        ti, si = t[i], sent[i]
+        if si != si or ti != ti:
+            continue
+        if (u[i] != u[i] or (nonpositive and u[i] <= 0)) and prev_sent == prev_sent:
+            dt = ti - prev_t
+            ds = si - prev_sent
+            if dt > 0 and ds >= 0:
+                u[i] = ds / dt
+                derived += 1
+        prev_t, prev_sent = ti, si
+    if derived and run.source.get("u_ach") is None:
+        run.source["u_ach"] = "Δsent_total/Δt"
+    run.derived = derived
+    return derived
+
+
+def _load_bin(path: str, bin_path: str, fields: List[str], require: Sequence[str], derive: bool,
+              raw: Sequence[str], order_by: Optional[str] = None, nonpositive: bool = False) -> RunColumns:
+    """Column-wise load from a runbin file: bulk copies, then row filter and u_ach fill."""
+    with RunFile(bin_path) as rf:
+        header = _bin_header(rf)
+        source = _plan(header, fields, raw, require)
+        n = rf.n_rows
+        cols: Dict[str, array] = {}
+        for name, c in source.items():
+            if c is None or c not in rf:
+                a = array("d", [NAN]) * n
+            elif rf.dtypes[c] == "i8":
+                a = array("d", [NAN if x == INT_MISSING else float(x) for x in rf[c]])
+            else:
+                a = array("d")
+                a.frombytes(rf[c].cast("B"))
+            cols[name] = a
+
+    bad = set()
+    for name in require:
+        bad.update(i for i, v in enumerate(cols[name]) if not v - v == 0)  # NaN or inf
+    if bad:
+        keep = [i for i in range(n) if i not in bad]
+        for name, a in cols.items():
+            cols[name] = array("d", [a[i] for i in keep])
+
+    run = RunColumns(path, cols, source)
+    if order_by is not None:
+        run.sort_by(order_by)
+    if derive:
+        _fill_u_ach(run, nonpositive)
+    return run
+
+
+def load_run(path: str, fields: Sequence[str] = FIELDS, require: Sequence[str] = ("t_sec", "u_cmd"),
+             derive_u_ach: bool = True, raw: Sequence[str] = (), cache: bool = True,
+             order_by: Optional[str] = None, fill_nonpositive: bool = False) -> RunColumns:
+    """
+    Load a run into columns.
+      fields            canonical fields to resolve through ALIASES
+      require           rows where any of these is missing (or infinite) are dropped
+      derive_u_ach      fill missing u_ach from Δsent_total/Δt between kept rows
+      raw               extra columns taken by exact header name (e.g. fit_arx --u_col)
+      cache             go through the parsed-run cache for CSV input (see cache_dir())
+      order_by          sort rows by this field before u_ach is derived (file order otherwise)
+      fill_nonpositive  also re-derive u_ach values <= 0, not only missing ones
+    """
+    fields = list(fields)
+    derive = derive_u_ach and all(f in fields for f in ("t_sec", "sent_total", "u_ach"))
+
+    if is_runbin(path):
+        return _load_bin(path, path, fields, require, derive, raw, order_by, fill_nonpositive)
+    entry = cached_runbin(path) if cache else None
+    if entry is not None:
+        try:
+            return _load_bin(path, entry, fields, require, derive, raw, order_by, fill_nonpositive)
+        except FileNotFoundError:  # evicted by a concurrent loader; parse the CSV
+            pass
+
+    with open_maybe_gz(path) as f:
+        r = csv.reader(f)
+        header = next(r, None)
+        if header is None:
+            raise SystemExit("ERROR: no header found")
+        header = [h.strip() for h in header]
+        source = _plan(header, fields, raw, require)
+        names = list(source.keys())
+        # with order_by, u_ach is derived after the sort instead of while reading
+        b = _Builder(names, require, derive and order_by is None, fill_nonpositive)
+        idx = [header.index(source[n]) if source[n] is not None else -1 for n in names]
+        width = max(idx) + 1 if idx else 0
+        conv = _to_float
+        for row in r:
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            b.add([conv(row[i]) if i >= 0 else NAN for i in idx])
+
+    if derive and b.derived and source.get("u_ach") is None:
+        source["u_ach"] = "Δsent_total/Δt"
+    run = RunColumns(path, b.cols, source, derived=b.derived)
+    if order_by is not None:
+        run.sort_by(order_by)
+        if derive:
+            _fill_u_ach(run, fill_nonpositive)
+    return run
+
+
+class RunStream:
+    """
+    Iterating yields one list of floats per kept row, in the order of names,
+    with load_run()'s row filter and u_ach fill. Only the current row is
+    held: CSVs are parsed as they are read, runbin files (and an existing
+    cache entry for a CSV) are read through their memory map. A cache miss
+    does not create an entry, since that would parse the whole file.
+    source is known up front; derived and n are final once iteration ends.
+    """
+
+    def __init__(self, path: str, fields: Sequence[str] = FIELDS, require: Sequence[str] = ("t_sec", "u_cmd"),
+                 derive_u_ach: bool = True, raw: Sequence[str] = (), cache: bool = True):
+        fields = list(fields)
+        self.path = path
+        self.require = require
+        self.derive = derive_u_ach and all(f in fields for f in ("t_sec", "sent_total", "u_ach"))
+        self.bin_path = path if is_runbin(path) else (cached_runbin(path, create=False) if cache else None)
+        if self.bin_path is not None:
+            with RunFile(self.bin_path) as rf:
+                header = _bin_header(rf)
+        else:
+            with open_maybe_gz(path) as f:
+                header = next(csv.reader(f), None)
+            if header is None:
+                raise SystemExit("ERROR: no header found")
+            header = [h.strip() for h in header]
+        self.header = header
+        self.source = _plan(header, fields, raw, require)
+        self.names = list(self.source.keys())
+        self.derived = 0
+        self.n = 0
+
+    def __iter__(self) -> Iterator[List[float]]:
+        b = _Builder(self.names, self.require, self.derive)
+        rows = self._bin_rows() if self.bin_path is not None else self._csv_rows()
+        n = 0
+        for vals in rows:
+            if b.keep(vals):
+                n += 1
+                yield vals
+        self.n = n
+        self.derived = b.derived
+        if b.derived and self.source.get("u_ach") is None:
+            self.source["u_ach"] = "Δsent_total/Δt"
+
+    def _csv_rows(self) -> Iterator[List[float]]:
+        idx = [self.header.index(c) if c is not None else -1 for c in self.source.values()]
+        width = max(idx) + 1 if idx else 0
+        conv = _to_float
+        with open_maybe_gz(self.path) as f:
+            r = csv.reader(f)
+            next(r, None)
+            for row in r:
+                if len(row) < width:
+                    row = row + [""] * (width - len(row))
+                yield [conv(row[i]) if i >= 0 else NAN for i in idx]
+
+    def _bin_rows(self) -> Iterator[List[float]]:
+        with RunFile(self.bin_path) as rf:
+            views = [rf[c] if c is not None and c in rf else None for c in self.source.values()]
+            ints = [v is not None and rf.dtypes[c] == "i8" for v, c in zip(views, self.source.values())]
+            for i in range(rf.n_rows):
+                vals = []
+                for v, is_int in zip(views, ints):
+                    if v is None:
+                        vals.append(NAN)
+                    elif is_int:
+                        x = v[i]
+                        vals.append(NAN if x == INT_MISSING else float(x))
+                    else:
+                        vals.append(v[i])
+                yield vals
+
+
+def segment_bounds(u_cmd: Sequence[float], t_sec: Sequence[float], min_seg_s: float = 8.0) -> List[Tuple[int, int]]:
+    """
+    Split into [start, end) index ranges where u_cmd is constant; ranges
+    shorter than min_seg_s or with fewer than 3 rows (warmups/transients)
+    are dropped.
+    """
+    n = len(u_cmd)
+    if n == 0:
+        return []
+    out: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(1, n + 1):
+        if i == n or abs(u_cmd[i] - u_cmd[i - 1]) >= 1e-9:
+            if t_sec[i - 1] - t_sec[start] >= min_seg_s and i - start >= 3:
+                out.append((start, i))
+            start = i
+    return out
@@ -10,82 +10,32 @@
 # - knee estimate (first segment where sat drops or latency grows)
 # - suggested steady_low / steady_high
 # - optionally writes a per-segment CSV summary
+#
+# Batch mode (a directory, glob or several files) summarizes every run in a
+# process pool into --out-dir, skipping runs unchanged since the last batch;
+# see summarize_batch().
+#
+# The run is read in one streaming pass (runload.RunStream) and each row
+# goes straight into the sketches of the segment it belongs to, so memory
+# does not grow with the run: it is the open segment's sketches, the
+# run-wide ones and the finished Segment rows. Medians and percentiles come
+# from qsketch.QuantileSketch: exact up to --exact-max samples per series,
+# a KLL sketch (rank error ~1.7/--sketch-k) beyond; --exact keeps every
+# value (and so gives up the bound).
 
 import argparse
 import csv
+import glob
+import json
 import math
-import statistics
+import os
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-
-
-ALIASES = {
-    "t_sec": ["t_sec", "t", "time_sec"],
-    "u_cmd": ["u_cmd", "lam_cmd", "lambda", "target_lambda", "rate"],
-    "sent_total": ["sent_total", "sent", "total_sent", "sent_ok_total", "ok_total"],
-    "u_ach": ["u_ach", "u_ach_from_total", "u_ach_reported", "sent_per_sec", "sent_per_sec_reported"],
-    "lat_p99": ["lat_p99", "y_lat_p99_sec", "lat_p99_sec", "p99", "latency_p99"],
-    "inflight": ["inflight", "in_flight"],
-    "err_per_sec": ["err_per_sec", "err_per_sec_reported", "errors_per_sec"],
-}
-
-def pick_col(fieldnames: List[str], keys: List[str]) -> Optional[str]:
-    exact = {h.strip(): h.strip() for h in fieldnames}
-    for k in keys:
-        if k in exact:
-            return k
-    lower = {h.strip().lower(): h.strip() for h in fieldnames}
-    for k in keys:
-        lk = k.lower()
-        if lk in lower:
-            return lower[lk]
-    return None
-
-def ffloat(x: str) -> Optional[float]:
-    x = (x or "").strip()
-    if not x:
-        return None
-    try:
-        return float(x)
-    except Exception:
-        return None
-
-def fint(x: str) -> Optional[int]:
-    x = (x or "").strip()
-    if not x:
-        return None
-    try:
-        return int(float(x))
-    except Exception:
-        return None
-
-def median(xs: List[float]) -> float:
-    return statistics.median(xs) if xs else float("nan")
-
-def pctl(xs: List[float], q: float) -> float:
-    if not xs:
-        return float("nan")
-    xs2 = sorted(xs)
-    if len(xs2) == 1:
-        return xs2[0]
-    # linear interpolation
-    pos = (len(xs2) - 1) * q
-    lo = int(math.floor(pos))
-    hi = int(math.ceil(pos))
-    if lo == hi:
-        return xs2[lo]
-    w = pos - lo
-    return xs2[lo] * (1 - w) + xs2[hi] * w
+from typing import Callable, Dict, List, Optional, Tuple
+
+from qsketch import QuantileSketch
+from runload import RunStream, file_sha256, isnan
 
-@dataclass
-class Row:
-    t_sec: float
-    u_cmd: float
-    sent_total: Optional[int]
-    u_ach: Optional[float]
-    lat_p99: Optional[float]
-    inflight: Optional[float]
-    err_per_sec: Optional[float]
 
 @dataclass
 class Segment:
@@ -98,179 +48,200 @@ class Segment:
     sat_med: float
     lat_med: float
     lat_p95: float
+    lat_p99: float
     err_med: float
     inflight_max: float
 
-def compute_u_ach_from_sent(rows: List[Row]) -> None:
-    """Fill missing u_ach using Δsent_total/Δt when possible."""
-    prev_sent = None
-    prev_t = None
-    for r in rows:
-        if r.u_ach is not None:
-            prev_sent = r.sent_total if r.sent_total is not None else prev_sent
-            prev_t = r.t_sec
-            continue
-        if r.sent_total is None or prev_sent is None or prev_t is None:
-            prev_sent = r.sent_total if r.sent_total is not None else prev_sent
-            prev_t = r.t_sec
-            continue
-        dt = r.t_sec - prev_t
-        ds = r.sent_total - prev_sent
-        if dt > 0 and ds >= 0:
-            r.u_ach = ds / dt
-        prev_sent = r.sent_total
-        prev_t = r.t_sec
-
-def segment_by_u_cmd(rows: List[Row], min_seg_s: float = 8.0) -> List[List[Row]]:
-    """Split into segments when u_cmd changes. Filters out too-short segments."""
-    if not rows:
-        return []
-    segs: List[List[Row]] = []
-    cur: List[Row] = [rows[0]]
-    for r in rows[1:]:
-        if abs(r.u_cmd - cur[-1].u_cmd) < 1e-9:
-            cur.append(r)
-        else:
-            segs.append(cur)
-            cur = [r]
-    segs.append(cur)
-
-    # drop segments that are too short (warmups/transients)
-    out = []
-    for s in segs:
-        dur = s[-1].t_sec - s[0].t_sec
-        if dur >= min_seg_s and len(s) >= 3:
-            out.append(s)
-    return out
-
-def summarize_segment(seg_rows: List[Row], idx: int) -> Segment:
-    u_cmd = seg_rows[0].u_cmd
-    t_start = seg_rows[0].t_sec
-    t_end = seg_rows[-1].t_sec
-    n = len(seg_rows)
-
-    uachs = [r.u_ach for r in seg_rows if r.u_ach is not None and r.u_ach > 0]
-    lats  = [r.lat_p99 for r in seg_rows if r.lat_p99 is not None and r.lat_p99 > 0]
-    errs  = [r.err_per_sec for r in seg_rows if r.err_per_sec is not None]
-    infls = [r.inflight for r in seg_rows if r.inflight is not None]
-
-    u_ach_med = median(uachs) if uachs else float("nan")
-    sat_med = (u_ach_med / u_cmd) if (not math.isnan(u_ach_med) and u_cmd > 0) else float("nan")
-    lat_med = median(lats) if lats else float("nan")
-    lat_p95 = pctl(lats, 0.95) if lats else float("nan")
-    err_med = median(errs) if errs else float("nan")
-    infl_max = max(infls) if infls else float("nan")
-
-    return Segment(
-        idx=idx, u_cmd=u_cmd, t_start=t_start, t_end=t_end, n=n,
-        u_ach_med=u_ach_med, sat_med=sat_med, lat_med=lat_med, lat_p95=lat_p95,
-        err_med=err_med, inflight_max=infl_max
-    )
+class SegmentStats:
+    """Running statistics of one constant-u_cmd stretch, fed row by row."""
+
+    def __init__(self, u_cmd: float, t: float, new_sketch: Callable[[], QuantileSketch]):
+        self.u_cmd = u_cmd
+        self.t_start = self.t_end = t
+        self.n = 0
+        self.uachs, self.lats, self.errs = new_sketch(), new_sketch(), new_sketch()
+        self.infl_max = float("nan")
+
+    def add(self, t: float, u_ach: float, lat: float, err: float, infl: float) -> None:
+        self.t_end = t
+        self.n += 1
+        if u_ach > 0:
+            self.uachs.add(u_ach)
+        if lat > 0:
+            self.lats.add(lat)
+        if not isnan(err):
+            self.errs.add(err)
+        if not isnan(infl) and not infl <= self.infl_max:
+            self.infl_max = infl
+
+    def segment(self, idx: int) -> Segment:
+        u_ach_med = self.uachs.median()
+        sat_med = (u_ach_med / self.u_cmd) if (not math.isnan(u_ach_med) and self.u_cmd > 0) else float("nan")
+        lats = self.lats
+        return Segment(
+            idx=idx, u_cmd=self.u_cmd, t_start=self.t_start, t_end=self.t_end, n=self.n,
+            u_ach_med=u_ach_med, sat_med=sat_med, lat_med=lats.median(), lat_p95=lats.quantile(0.95),
+            lat_p99=lats.quantile(0.99), err_med=self.errs.median(), inflight_max=self.infl_max
+        )
 
 def fmt(x: float, nd: int = 3) -> str:
     if x is None or (isinstance(x, float) and math.isnan(x)):
         return "nan"
     return f"{x:.{nd}f}"
 
-def main():
-    ap = argparse.ArgumentParser(description="Summarize a run CSV (step/steady) into segment stats and knee estimate.")
-    ap.add_argument("csv_path")
-    ap.add_argument("--min-seg-s", type=float, default=8.0, help="Minimum segment duration to keep (seconds).")
-    ap.add_argument("--sat-knee", type=float, default=0.92, help="Saturation threshold for knee detection.")
-    ap.add_argument("--lat-mult-knee", type=float, default=1.25, help="Latency multiplier vs baseline for knee detection.")
-    ap.add_argument("--sat-low", type=float, default=0.98, help="Saturation threshold for steady_low suggestion.")
-    ap.add_argument("--lat-mult-low", type=float, default=1.10, help="Latency multiplier vs baseline for steady_low suggestion.")
-    ap.add_argument("--out-segments-csv", default="", help="If set, write per-segment summary CSV here.")
-    args = ap.parse_args()
+SEGMENT_COLUMNS = ["idx","u_cmd","dur_s","n","u_ach_med","sat_med","lat_med_s","lat_p95_s","err_med","inflight_max","lat_p99_s"]
+
+def segment_row(s: Segment) -> List:
+    dur = s.t_end - s.t_start
+    return [
+        s.idx, int(round(s.u_cmd)), f"{dur:.3f}", s.n,
+        f"{s.u_ach_med:.6f}" if not math.isnan(s.u_ach_med) else "",
+        f"{s.sat_med:.6f}" if not math.isnan(s.sat_med) else "",
+        f"{s.lat_med:.9f}" if not math.isnan(s.lat_med) else "",
+        f"{s.lat_p95:.9f}" if not math.isnan(s.lat_p95) else "",
+        f"{s.err_med:.6f}" if not math.isnan(s.err_med) else "",
+        f"{s.inflight_max:.3f}" if not math.isnan(s.inflight_max) else "",
+        f"{s.lat_p99:.9f}" if not math.isnan(s.lat_p99) else "",
+    ]
+
+def write_segments_csv(path: str, segs: List[Segment]) -> None:
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(SEGMENT_COLUMNS)
+        for s in segs:
+            w.writerow(segment_row(s))
 
-    with open(args.csv_path, "r", newline="") as f:
-        r = csv.DictReader(f)
-        if r.fieldnames is None:
-            raise SystemExit("ERROR: no header found")
-
-        col_t = pick_col(r.fieldnames, ALIASES["t_sec"])
-        col_u = pick_col(r.fieldnames, ALIASES["u_cmd"])
-        col_sent = pick_col(r.fieldnames, ALIASES["sent_total"])
-        col_uach = pick_col(r.fieldnames, ALIASES["u_ach"])
-        col_lat = pick_col(r.fieldnames, ALIASES["lat_p99"])
-        col_infl = pick_col(r.fieldnames, ALIASES["inflight"])
-        col_err = pick_col(r.fieldnames, ALIASES["err_per_sec"])
-
-        if col_t is None or col_u is None:
-            raise SystemExit("ERROR: need t_sec and u_cmd (or aliases)")
-
-        rows: List[Row] = []
-        for row in r:
-            t = ffloat(row.get(col_t, ""))
-            u = ffloat(row.get(col_u, ""))
-            if t is None or u is None:
-                continue
-            sent = fint(row.get(col_sent, "")) if col_sent else None
-            uach = ffloat(row.get(col_uach, "")) if col_uach else None
-            lat = ffloat(row.get(col_lat, "")) if col_lat else None
-            infl = ffloat(row.get(col_infl, "")) if col_infl else None
-            err = ffloat(row.get(col_err, "")) if col_err else None
+def sketch_factory(args) -> Callable[[], QuantileSketch]:
+    def new_sketch() -> QuantileSketch:
+        return QuantileSketch(k=args.sketch_k, exact_max=None if args.exact else args.exact_max)
+    return new_sketch
 
-            rows.append(Row(t_sec=t, u_cmd=u, sent_total=sent, u_ach=uach, lat_p99=lat, inflight=infl, err_per_sec=err))
+@dataclass
+class RunStats:
+    n: int
+    t_first: float
+    t_last: float
+    dts: QuantileSketch
+    u_cmd_min: float
+    u_cmd_max: float
+    uach_min: float
+    uach_max: float
+    lats: QuantileSketch
+
+SCAN_FIELDS = ("t_sec", "u_cmd", "sent_total", "u_ach", "lat_p99", "inflight", "err_per_sec")
+
+def scan_run(path: str, min_seg_s: float,
+             new_sketch: Callable[[], QuantileSketch]) -> Tuple[RunStats, List[Segment], bool]:
+    """
+    One pass over a run: overall stats and the segment table. Segments are
+    the constant-u_cmd stretches of at least min_seg_s and 3 rows (as
+    runload.segment_bounds); the flag is False when there are none and the
+    table is one whole-run segment instead.
+    """
+    nan = float("nan")
+    segs: List[Segment] = []
+    cur: Optional[SegmentStats] = None
+    whole: Optional[SegmentStats] = None  # fallback, only fed until a segment is kept
+    dts, lats = new_sketch(), new_sketch()
+    n = 0
+    t_first = prev_t = prev_u = nan
+    u_min = u_max = uach_min = uach_max = nan
+
+    def close(seg: Optional[SegmentStats]) -> None:
+        nonlocal whole
+        if seg is not None and seg.t_end - seg.t_start >= min_seg_s and seg.n >= 3:
+            segs.append(seg.segment(len(segs) + 1))
+            whole = None
+
+    for t, u, _, u_ach, lat, infl, err in RunStream(path, SCAN_FIELDS):
+        if n == 0:
+            t_first = t
+            whole = SegmentStats(u, t, new_sketch)
+        elif t > prev_t:
+            dts.add(t - prev_t)
+        if cur is None or abs(u - prev_u) >= 1e-9:
+            close(cur)
+            cur = SegmentStats(u, t, new_sketch)
+        cur.add(t, u_ach, lat, err, infl)
+        if whole is not None:
+            whole.add(t, u_ach, lat, err, infl)
+
+        if not u >= u_min:
+            u_min = u
+        if not u <= u_max:
+            u_max = u
+        if u_ach > 0:
+            if not u_ach >= uach_min:
+                uach_min = u_ach
+            if not u_ach <= uach_max:
+                uach_max = u_ach
+        if lat > 0:
+            lats.add(lat)
+        prev_t, prev_u = t, u
+        n += 1
+    close(cur)
+
+    stepped = bool(segs)
+    if not segs and whole is not None:
+        segs = [whole.segment(1)]
+    stats = RunStats(n=n, t_first=t_first, t_last=prev_t, dts=dts, u_cmd_min=u_min, u_cmd_max=u_max,
+                     uach_min=uach_min, uach_max=uach_max, lats=lats)
+    return stats, segs, stepped
+
+def baseline_latency(segs: List[Segment]) -> float:
+    """First segment with a valid lat_med."""
+    for s in segs:
+        if not math.isnan(s.lat_med) and s.lat_med > 0:
+            return s.lat_med
+    return float("nan")
 
-    if len(rows) < 5:
-        raise SystemExit(f"ERROR: too few rows parsed: {len(rows)}")
+def knee_triggered(s: Segment, baseline_lat: float, sat_knee: float, lat_mult_knee: float) -> bool:
+    sat_bad = (not math.isnan(s.sat_med)) and (s.sat_med <= sat_knee)
+    lat_bad = (not math.isnan(s.lat_med)) and (s.lat_med >= lat_mult_knee * baseline_lat)
+    return sat_bad or lat_bad
 
-    # compute dt stats
-    dts = [rows[i].t_sec - rows[i-1].t_sec for i in range(1, len(rows)) if rows[i].t_sec > rows[i-1].t_sec]
-    dt_med = median(dts)
-    dt_min = min(dts) if dts else float("nan")
-    dt_max = max(dts) if dts else float("nan")
+def summarize_file(path: str, args) -> None:
 
-    # fill missing u_ach
-    compute_u_ach_from_sent(rows)
+    # one pass: overall stats and segments (missing u_ach is filled from sent_total by the loader)
+    st, segs, stepped = scan_run(path, args.min_seg_s, sketch_factory(args))
+    n = st.n
+    if n < 5:
+        raise SystemExit(f"ERROR: too few rows parsed: {n}")
 
-    # overall ranges
-    u_cmds = [x.u_cmd for x in rows]
-    uachs = [x.u_ach for x in rows if x.u_ach is not None and x.u_ach > 0]
-    lats = [x.lat_p99 for x in rows if x.lat_p99 is not None and x.lat_p99 > 0]
+    dts, lats = st.dts, st.lats
+    dt_med = dts.median()
+    dt_min = dts.min if dts.n else float("nan")
+    dt_max = dts.max if dts.n else float("nan")
 
     print("=== Run summary ===")
-    print(f"file: {args.csv_path}")
-    print(f"rows: {len(rows)}")
-    print(f"t: {fmt(rows[0].t_sec)} .. {fmt(rows[-1].t_sec)} (sec)")
+    print(f"file: {path}")
+    print(f"rows: {n}")
+    print(f"t: {fmt(st.t_first)} .. {fmt(st.t_last)} (sec)")
     print(f"dt median/min/max: {fmt(dt_med)} / {fmt(dt_min)} / {fmt(dt_max)} (sec)")
-    print(f"u_cmd range: {fmt(min(u_cmds))} .. {fmt(max(u_cmds))}")
-    if uachs:
-        print(f"u_ach range: {fmt(min(uachs))} .. {fmt(max(uachs))}")
+    print(f"u_cmd range: {fmt(st.u_cmd_min)} .. {fmt(st.u_cmd_max)}")
+    if not math.isnan(st.uach_min):
+        print(f"u_ach range: {fmt(st.uach_min)} .. {fmt(st.uach_max)}")
     else:
         print("u_ach: no valid samples (check /stats parsing or sent_total).")
-    if lats:
-        print(f"lat_p99 median/p95/max: {fmt(median(lats),4)} / {fmt(pctl(lats,0.95),4)} / {fmt(max(lats),4)} (s)")
+    if lats.n:
+        print(f"lat_p99 median/p95/max: {fmt(lats.median(),4)} / {fmt(lats.quantile(0.95),4)} / {fmt(lats.max,4)} (s)")
     else:
         print("lat_p99: no valid samples (check /metrics).")
     print()
 
     # segments
-    segs_raw = segment_by_u_cmd(rows, min_seg_s=args.min_seg_s)
-    if not segs_raw:
+    if not stepped:
         print("No step segments detected (likely steady run). Creating a single segment.")
-        segs_raw = [rows]
-
-    segs: List[Segment] = []
-    for i, s in enumerate(segs_raw, 1):
-        segs.append(summarize_segment(s, idx=i))
-
-    # baseline latency: take first segment with valid lat_med
-    baseline_lat = float("nan")
-    for s in segs:
-        if not math.isnan(s.lat_med) and s.lat_med > 0:
-            baseline_lat = s.lat_med
-            break
+    baseline_lat = baseline_latency(segs)
 
     print("=== Segment table (by detected u_cmd steps) ===")
-    print("idx  u_cmd  dur_s  n   u_ach_med  sat_med  lat_med(s)  lat_p95(s)  err_med  infl_max")
+    print("idx  u_cmd  dur_s  n   u_ach_med  sat_med  lat_med(s)  lat_p95(s)  lat_p99(s)  err_med  infl_max")
     for s in segs:
         dur = s.t_end - s.t_start
         print(
             f"{s.idx:>3d}  {fmt(s.u_cmd,0):>5}  {fmt(dur,1):>5}  {s.n:>3d}  "
             f"{fmt(s.u_ach_med,1):>8}  {fmt(s.sat_med,3):>7}  "
-            f"{fmt(s.lat_med,4):>9}  {fmt(s.lat_p95,4):>10}  "
+            f"{fmt(s.lat_med,4):>9}  {fmt(s.lat_p95,4):>10}  {fmt(s.lat_p99,4):>10}  "
             f"{fmt(s.err_med,3):>7}  {fmt(s.inflight_max,0):>8}"
         )
     print()
@@ -279,9 +250,7 @@ def main():
     knee = None
     if not math.isnan(baseline_lat):
         for s in segs:
-            sat_bad = (not math.isnan(s.sat_med)) and (s.sat_med <= args.sat_knee)
-            lat_bad = (not math.isnan(s.lat_med)) and (s.lat_med >= args.lat_mult_knee * baseline_lat)
-            if sat_bad or lat_bad:
+            if knee_triggered(s, baseline_lat, args.sat_knee, args.lat_mult_knee):
                 knee = s
                 break
 
@@ -314,12 +283,7 @@ def main():
             steady_low = max(low_cands, key=lambda x: x.u_cmd)
 
         # high: lowest u_cmd where sat<=sat_knee OR lat>=lat_mult_knee*baseline
-        high_cands = []
-        for s in segs:
-            sat_bad = (not math.isnan(s.sat_med)) and (s.sat_med <= args.sat_knee)
-            lat_bad = (not math.isnan(s.lat_med)) and (s.lat_med >= args.lat_mult_knee * baseline_lat)
-            if sat_bad or lat_bad:
-                high_cands.append(s)
+        high_cands = [s for s in segs if knee_triggered(s, baseline_lat, args.sat_knee, args.lat_mult_knee)]
         if high_cands:
             steady_high = min(high_cands, key=lambda x: x.u_cmd)
 
@@ -336,21 +300,188 @@ def main():
 
     # optionally write per-segment csv
     if args.out_segments_csv:
-        with open(args.out_segments_csv, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["idx","u_cmd","dur_s","n","u_ach_med","sat_med","lat_med_s","lat_p95_s","err_med","inflight_max"])
-            for s in segs:
-                dur = s.t_end - s.t_start
-                w.writerow([
-                    s.idx, int(round(s.u_cmd)), f"{dur:.3f}", s.n,
-                    f"{s.u_ach_med:.6f}" if not math.isnan(s.u_ach_med) else "",
-                    f"{s.sat_med:.6f}" if not math.isnan(s.sat_med) else "",
-                    f"{s.lat_med:.9f}" if not math.isnan(s.lat_med) else "",
-                    f"{s.lat_p95:.9f}" if not math.isnan(s.lat_p95) else "",
-                    f"{s.err_med:.6f}" if not math.isnan(s.err_med) else "",
-                    f"{s.inflight_max:.3f}" if not math.isnan(s.inflight_max) else "",
-                ])
+        write_segments_csv(args.out_segments_csv, segs)
         print(f"Wrote segment summary CSV: {args.out_segments_csv}")
 
+# ---- batch mode ------------------------------------------------------------
+#
+# Each run is summarized in a worker process into <out-dir>/segments_<run>.csv.
+# manifest.json records each input's size, mtime and SHA-256 together with
+# the analysis parameters; a run whose content and parameters are unchanged
+# (and whose CSV is still there) is skipped. segments_campaign.csv is then
+# rebuilt from the per-run CSVs: one row per segment, prefixed with the run
+# name, plus a knee flag on each run's first triggering segment.
+
+BATCH_VERSION = 1
+RUN_SUFFIXES = (".csv.gz", ".csv", ".runbin")
+
+def expand_inputs(items: List[str]) -> List[str]:
+    """Files, directories (their run files) and glob patterns -> sorted unique paths.
+
+    A CSV with a .runbin of the same stem next to it (what `runbin.py to-bin`
+    writes by default) is one run: the .runbin is kept, the CSV dropped.
+    """
+    out: List[str] = []
+    for item in items:
+        if os.path.isdir(item):
+            out.extend(os.path.join(item, f) for f in os.listdir(item) if f.endswith(RUN_SUFFIXES))
+        elif glob.has_magic(item):
+            out.extend(p for p in glob.glob(item) if os.path.isfile(p))
+        else:
+            out.append(item)
+    if not out:
+        raise SystemExit(f"ERROR: no run files in {' '.join(items)}")
+    out = list(dict.fromkeys(out))
+    binned = {os.path.join(os.path.dirname(p), run_name(p)) for p in out if p.endswith(".runbin")}
+    out = [p for p in out if p.endswith(".runbin")
+           or os.path.join(os.path.dirname(p), run_name(p)) not in binned]
+    return sorted(out)
+
+def run_name(path: str) -> str:
+    base = os.path.basename(path)
+    for suf in RUN_SUFFIXES:
+        if base.endswith(suf):
+            return base[:-len(suf)]
+    return base
+
+def batch_params(args) -> Dict:
+    return {"version": BATCH_VERSION, "min_seg_s": args.min_seg_s, "sat_knee": args.sat_knee,
+            "lat_mult_knee": args.lat_mult_knee, "exact": args.exact, "exact_max": args.exact_max,
+            "sketch_k": args.sketch_k}
+
+def summarize_one(path: str, out_csv: str, args) -> Dict:
+    """Worker: segment table of one run -> out_csv; returns its manifest fields."""
+    # one bad run (truncated, malformed, missing columns) is recorded, not fatal to the batch
+    try:
+        st, segs, _ = scan_run(path, args.min_seg_s, sketch_factory(args))
+        if st.n < 5:
+            raise SystemExit(f"too few rows parsed: {st.n}")
+        baseline_lat = baseline_latency(segs)
+        knee = None
+        if not math.isnan(baseline_lat):
+            knee = next((s for s in segs if knee_triggered(s, baseline_lat, args.sat_knee, args.lat_mult_knee)),
+                        None)
+        write_segments_csv(out_csv, segs)
+    except SystemExit as e:
+        return {"error": str(e), "file": path}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "file": path}
+    return {"rows": st.n, "segments": len(segs), "knee_idx": knee.idx if knee else None,
+            "knee_u_cmd": knee.u_cmd if knee else None}
+
+def pool_result(fut, path: str) -> Dict:
+    """A worker that died (BrokenProcessPool, pickling) counts as that run's error."""
+    try:
+        return fut.result()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "file": path}
+
+def summarize_batch(paths: List[str], args) -> None:
+    os.makedirs(args.out_dir, exist_ok=True)
+    manifest_path = os.path.join(args.out_dir, "manifest.json")
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    params = batch_params(args)
+    old = manifest.get("runs", {}) if manifest.get("params") == params and not args.force else {}
+
+    names: Dict[str, str] = {}
+    for p in paths:
+        name = run_name(p)
+        if name in names:
+            raise SystemExit(f"ERROR: two runs named {name}: {names[name]} and {p}")
+        names[name] = p
+
+    runs: Dict[str, Dict] = {}
+    todo: List[Tuple[str, str]] = []
+    for name, p in names.items():
+        st = os.stat(p)
+        key = os.path.abspath(p)
+        rec = old.get(key, {})
+        if rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+            sha = rec["sha256"]
+        else:
+            sha = file_sha256(p)
+        out_csv = os.path.join(args.out_dir, f"segments_{name}.csv")
+        if rec.get("sha256") == sha and "error" not in rec and os.path.exists(out_csv):
+            runs[key] = dict(rec, size=st.st_size, mtime_ns=st.st_mtime_ns)
+        else:
+            runs[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha,
+                         "name": name, "segments_csv": out_csv}
+            todo.append((key, p))
+
+    print(f"batch: {len(paths)} runs, {len(paths) - len(todo)} unchanged, {len(todo)} to summarize")
+    if len(todo) > 1 and args.jobs != 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs or os.cpu_count() or 1, len(todo))) as ex:
+            names_by_key = dict(todo)
+            futs = {key: ex.submit(summarize_one, p, runs[key]["segments_csv"], args) for key, p in todo}
+            results = {key: pool_result(fut, names_by_key[key]) for key, fut in futs.items()}
+    else:
+        results = {key: summarize_one(p, runs[key]["segments_csv"], args) for key, p in todo}
+    for key, res in results.items():
+        runs[key].update(res)
+        rec = runs[key]
+        if "error" in rec:
+            print(f"  {rec['name']}: ERROR: {rec['error']} ({rec['file']})")
+        else:
+            knee = fmt(rec["knee_u_cmd"], 0) if rec["knee_u_cmd"] is not None else "-"
+            print(f"  {rec['name']}: {rec['rows']} rows, {rec['segments']} segments, knee u_cmd={knee}")
+
+    # keep manifest entries of runs not in this batch, so batches over subsets don't undo each other
+    if manifest.get("params") == params:
+        runs = dict(manifest.get("runs", {}), **runs)
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "runs": runs}, f, indent=1, sort_keys=True)
+    os.replace(tmp, manifest_path)
+
+    campaign = os.path.join(args.out_dir, "segments_campaign.csv")
+    n_rows = 0
+    n_failed = 0
+    with open(campaign + ".tmp", "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["run", *SEGMENT_COLUMNS, "knee"])
+        for name, p in names.items():
+            rec = runs[os.path.abspath(p)]
+            if "error" in rec:
+                n_failed += 1
+                continue
+            with open(rec["segments_csv"], "r", newline="") as g:
+                r = csv.reader(g)
+                next(r, None)
+                for row in r:
+                    w.writerow([name, *row, int(row[0] == str(rec["knee_idx"]))])
+                    n_rows += 1
+    os.replace(campaign + ".tmp", campaign)
+    failed = f", {n_failed} runs failed (see manifest.json)" if n_failed else ""
+    print(f"Wrote campaign table: {campaign} ({n_rows} segments{failed})")
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize a run CSV (step/steady) into segment stats and knee estimate.")
+    ap.add_argument("csv_path", nargs="+",
+                    help="Run file; a directory, glob or several files switch to batch mode (see --out-dir).")
+    ap.add_argument("--min-seg-s", type=float, default=8.0, help="Minimum segment duration to keep (seconds).")
+    ap.add_argument("--sat-knee", type=float, default=0.92, help="Saturation threshold for knee detection.")
+    ap.add_argument("--lat-mult-knee", type=float, default=1.25, help="Latency multiplier vs baseline for knee detection.")
+    ap.add_argument("--sat-low", type=float, default=0.98, help="Saturation threshold for steady_low suggestion.")
+    ap.add_argument("--lat-mult-low", type=float, default=1.10, help="Latency multiplier vs baseline for steady_low suggestion.")
+    ap.add_argument("--out-segments-csv", default="", help="If set, write per-segment summary CSV here.")
+    ap.add_argument("--exact", action="store_true", help="Exact percentiles: keep every value (memory grows with the run).")
+    ap.add_argument("--exact-max", type=int, default=2048, help="Per-series sample count kept exactly before sketching.")
+    ap.add_argument("--sketch-k", type=int, default=200, help="Quantile sketch size; rank error ~1.7/k.")
+    ap.add_argument("--out-dir", default="results/batch",
+                    help="Batch mode: per-run segments_<run>.csv, segments_campaign.csv and manifest.json go here.")
+    ap.add_argument("--jobs", type=int, default=0, help="Batch mode: worker processes (0 = all cores).")
+    ap.add_argument("--force", action="store_true", help="Batch mode: ignore the manifest and redo every run.")
+    args = ap.parse_args()
+
+    paths = expand_inputs(args.csv_path)
+    if len(paths) == 1 and paths[0] == args.csv_path[0]:
+        summarize_file(paths[0], args)
+    else:
+        summarize_batch(paths, args)
+
 if __name__ == "__main__":
     main()
@@ -1,10 +1,23 @@
 #!/usr/bin/env python3
 import argparse
+import bisect
+import http.client
 import json
-import re
+import math
+import os
+import signal
+import socket
+import stat
+import statistics
+import sys
+import threading
 import time
-import urllib.request
-from typing import Any, Dict, Optional, Tuple
+import urllib.error
+import urllib.parse
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
 
 DEFAULT_RATE_KEY = "rate"
 
@@ -22,17 +35,215 @@ CAND_ACH_REPORTED = [
     "throughput", "achieved_rate", "achievedRate", "u_ach"
 ]
 
+class HttpPool:
+    """
+    Keep-alive HTTP/1.1 connections, pooled per (scheme, host, port).
+    A request that fails on a reused connection (server closed it while idle,
+    tunnel restarted, ...) is retried once on a fresh connection.
+    """
+    def __init__(self, max_idle_per_host: int = 4):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], list] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+
+    def _acquire(self, key: Tuple[str, str, int], timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.opened += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: float = 2.5) -> str:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "127.0.0.1", port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        with self._lock:
+            self.requests += 1
+        for attempt in (0, 1):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                if reused and attempt == 0:
+                    with self._lock:
+                        self.reconnects += 1
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            if resp.status >= 400:
+                raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            return data.decode("utf-8", errors="replace")
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            c.close()
+
+_HTTP = HttpPool()
+
 def http_get(url: str, timeout: float = 2.5) -> str:
-    req = urllib.request.Request(url, method="GET")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return resp.read().decode("utf-8", errors="replace")
+    return _HTTP.request("GET", url, timeout=timeout)
 
 def http_post_json(url: str, payload: Dict[str, Any], timeout: float = 2.5) -> str:
     data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Content-Type", "application/json")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return resp.read().decode("utf-8", errors="replace")
+    return _HTTP.request("POST", url, body=data, headers={"Content-Type": "application/json"}, timeout=timeout)
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds in ms) with count/sum/max."""
+    BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+    def __init__(self):
+        self.buckets = [0] * len(self.BOUNDS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        for i, ub in enumerate(self.BOUNDS_MS):
+            if ms <= ub:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (max for the open bucket)."""
+        if self.count == 0:
+            return float("nan")
+        need = q * self.count
+        acc = 0
+        for ub, n in zip(self.BOUNDS_MS, self.buckets):
+            acc += n
+            if acc >= need:
+                return min(ub, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else None,
+            "max_ms": self.max,
+            "buckets_le_ms": {("+Inf" if math.isinf(ub) else str(ub)): n for ub, n in zip(self.BOUNDS_MS, self.buckets)},
+        }
+
+class SelfStats:
+    """
+    Collector self-instrumentation: request latency per endpoint, failures by
+    kind, parse failures, tick lateness and missed deadlines. Written to a
+    sidecar JSON and summarized on stderr at exit.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.req_ms: Dict[str, Histogram] = {}
+        self.counters: Counter = Counter()
+        self.tick_lag_ms = Histogram()
+        self.ticks = 0
+        self.skipped = 0
+        self.late = 0
+        self.period = 0.0
+        self.late_tol = 0.1
+
+    def request(self, endpoint: str, ms: float, error: Optional[str] = None) -> None:
+        with self.lock:
+            self.req_ms.setdefault(endpoint, Histogram()).add(ms)
+            if error:
+                self.counters[f"{endpoint} {error}"] += 1
+
+    def count(self, what: str, n: int = 1) -> None:
+        with self.lock:
+            self.counters[what] += n
+
+    def tick(self, lag: float, skipped: int) -> None:
+        with self.lock:
+            self.ticks += 1
+            self.skipped += skipped
+            self.tick_lag_ms.add(lag * 1000.0)
+            if skipped or lag > self.late_tol * self.period:
+                self.late += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "sample_period_s": self.period,
+                "ticks": self.ticks,
+                "ticks_skipped": self.skipped,
+                "missed_deadlines": self.late,
+                "late_tolerance_s": self.late_tol * self.period,
+                "tick_lag": self.tick_lag_ms.to_dict(),
+                "requests": {ep: h.to_dict() for ep, h in sorted(self.req_ms.items())},
+                "failures": dict(sorted(self.counters.items())),
+            }
+
+    def summary(self) -> List[str]:
+        with self.lock:
+            out = [
+                f"ticks: {self.ticks}, skipped: {self.skipped}, missed deadlines: {self.late} "
+                f"(late > {self.late_tol * self.period * 1000:.0f} ms)",
+                f"tick lag p50/p99/max: {self.tick_lag_ms.quantile(0.5):.0f} / "
+                f"{self.tick_lag_ms.quantile(0.99):.0f} / {self.tick_lag_ms.max:.0f} ms",
+            ]
+            for ep, h in sorted(self.req_ms.items()):
+                out.append(f"{ep}: n={h.count} p50<={h.quantile(0.5):.0f} ms p99<={h.quantile(0.99):.0f} ms "
+                           f"max={h.max:.0f} ms")
+            for k, n in sorted(self.counters.items()):
+                out.append(f"{k}: {n}")
+        return out
+
+_SELF = SelfStats()
+
+def classify_error(e: Exception) -> str:
+    if isinstance(e, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(e, urllib.error.HTTPError):
+        return f"http_{e.code}"
+    if isinstance(e, (ConnectionError, http.client.HTTPException)):
+        return "conn_error"
+    if isinstance(e, OSError):
+        return "os_error"
+    return "error"
+
+def endpoint_of(url: str) -> str:
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.hostname}:{parts.port}{parts.path or '/'}"
 
 def as_float(v: Any) -> Optional[float]:
     if isinstance(v, (int, float)):
@@ -47,10 +258,13 @@ def as_float(v: Any) -> Optional[float]:
             return None
     return None
 
-def find_key_recursive(obj: Any, candidates: list[str]) -> Optional[float]:
+KeyPath = Tuple[Any, ...]
+
+def find_key_path(obj: Any, candidates: list[str], path: KeyPath = ()) -> Optional[Tuple[KeyPath, float]]:
     """
-    Return first numeric value found for any candidate key (recursive in dict/list),
-    accepts numeric strings too.
+    Return (path, value) of the first numeric value found for any candidate key
+    (recursive in dict/list), accepts numeric strings too. path is the tuple of
+    dict keys / list indices leading to the value.
     """
     if isinstance(obj, dict):
         # direct match
@@ -58,7 +272,7 @@ def find_key_recursive(obj: Any, candidates: list[str]) -> Optional[float]:
             if k in obj:
                 got = as_float(obj[k])
                 if got is not None:
-                    return got
+                    return path + (k,), got
 
         # case-insensitive key match
         lower_map = {str(k).lower(): k for k in obj.keys()}
@@ -67,68 +281,368 @@ def find_key_recursive(obj: Any, candidates: list[str]) -> Optional[float]:
             if lk in lower_map:
                 got = as_float(obj[lower_map[lk]])
                 if got is not None:
-                    return got
+                    return path + (lower_map[lk],), got
 
         # recurse
-        for v in obj.values():
-            got = find_key_recursive(v, candidates)
-            if got is not None:
-                return got
+        for k, v in obj.items():
+            found = find_key_path(v, candidates, path + (k,))
+            if found is not None:
+                return found
 
     elif isinstance(obj, list):
-        for it in obj:
-            got = find_key_recursive(it, candidates)
+        for idx, it in enumerate(obj):
+            found = find_key_path(it, candidates, path + (idx,))
+            if found is not None:
+                return found
+
+    return None
+
+def find_key_recursive(obj: Any, candidates: list[str]) -> Optional[float]:
+    found = find_key_path(obj, candidates)
+    return found[1] if found is not None else None
+
+def resolve_key_path(obj: Any, path: KeyPath) -> Optional[float]:
+    """Follow a path from find_key_path; None if any step is missing or non-numeric."""
+    for step in path:
+        if isinstance(obj, dict):
+            if step not in obj:
+                return None
+        elif isinstance(obj, list):
+            if not isinstance(step, int) or step >= len(obj):
+                return None
+        else:
+            return None
+        obj = obj[step]
+    return as_float(obj)
+
+class StatsParser:
+    """
+    /stats field lookup with learned key paths: the full recursive search runs
+    once per field, later samples just follow the cached path. A cached path
+    that stops resolving is dropped and the search runs again. Fields the
+    payload doesn't carry at all are only searched for every absent_retry parses.
+    """
+    FIELDS = (
+        ("sent_total", CAND_SENT_TOTAL),
+        ("inflight", CAND_INFLIGHT),
+        ("err_per_sec", CAND_ERR_PSEC),
+        ("u_ach", CAND_ACH_REPORTED),
+    )
+
+    def __init__(self, absent_retry: int = 50):
+        self.absent_retry = absent_retry
+        self.paths: Dict[str, KeyPath] = {}
+        self.absent: Dict[str, int] = {}
+        self.misses = 0
+
+    def lookup(self, obj: Any, field: str, candidates: list[str]) -> Optional[float]:
+        path = self.paths.get(field)
+        if path is not None:
+            got = resolve_key_path(obj, path)
             if got is not None:
                 return got
+            del self.paths[field]
+            self.misses += 1
+        elif self.absent.get(field, 0) > 0:
+            self.absent[field] -= 1
+            return None
+        found = find_key_path(obj, candidates)
+        if found is None:
+            self.absent[field] = self.absent_retry
+            return None
+        self.absent.pop(field, None)
+        self.paths[field] = found[0]
+        return found[1]
 
-    return None
+    def parse(self, stats_text: str) -> Tuple[Optional[int], Optional[float], Optional[float], Optional[float]]:
+        """
+        Returns: sent_total (int), inflight, err_per_sec, u_ach_reported
+        """
+        try:
+            obj = json.loads(stats_text)
+        except Exception:
+            _SELF.count("parse /stats bad_json")
+            return None, None, None, None
+
+        sent, infl, err, ach = (self.lookup(obj, field, cands) for field, cands in self.FIELDS)
+        if sent is None:
+            _SELF.count("parse /stats no sent_total")
+        sent_i = int(sent) if sent is not None else None
+        return sent_i, infl, err, ach
+
+_STATS_PARSER = StatsParser()
 
 def parse_stats(stats_text: str) -> Tuple[Optional[int], Optional[float], Optional[float], Optional[float]]:
     """
     Returns: sent_total (int), inflight, err_per_sec, u_ach_reported
     """
-    try:
-        obj = json.loads(stats_text)
-    except Exception:
-        return None, None, None, None
+    return _STATS_PARSER.parse(stats_text)
 
-    sent = find_key_recursive(obj, CAND_SENT_TOTAL)
-    infl = find_key_recursive(obj, CAND_INFLIGHT)
-    err  = find_key_recursive(obj, CAND_ERR_PSEC)
-    ach  = find_key_recursive(obj, CAND_ACH_REPORTED)
+@dataclass(frozen=True)
+class SeriesSpec:
+    column: str                          # output CSV column
+    name: str                            # exposed sample name, incl. _sum/_count/_bucket suffix
+    labels: Tuple[Tuple[str, str], ...]  # labels that must match (others are ignored)
 
-    sent_i = int(sent) if sent is not None else None
-    return sent_i, infl, err, ach
+def parse_series_spec(text: str) -> SeriesSpec:
+    """
+    COLUMN=NAME or COLUMN=NAME{label="v",...}, e.g.
+      lat_sum=solana_transaction_latency_seconds_sum
+      lat_le1=solana_transaction_latency_seconds_bucket{le="1"}
+    """
+    col, sep, sel = text.partition("=")
+    col, sel = col.strip(), sel.strip()
+    if not sep or not col or not sel:
+        raise argparse.ArgumentTypeError(f"expected COLUMN=METRIC{{labels}}, got: {text!r}")
+    name, brace, rest = sel.partition("{")
+    labels: Dict[str, str] = {}
+    if brace:
+        labels, _ = parse_labels(sel, len(name) + 1)
+    return SeriesSpec(col, name.strip(), tuple(sorted(labels.items())))
 
-def parse_lat_p99(metrics_text: str, metric_name: str, quantile: str) -> Optional[float]:
-    pat = re.compile(
-        rf'^{re.escape(metric_name)}\{{[^}}]*quantile="{re.escape(quantile)}"[^}}]*\}}\s+([0-9eE\.\+\-]+)\s*$'
-    )
-    for line in metrics_text.splitlines():
-        m = pat.match(line.strip())
-        if m:
+def parse_labels(line: str, i: int) -> Tuple[Dict[str, str], int]:
+    """Parse a label set starting just after '{'; returns (labels, index after '}')."""
+    labels: Dict[str, str] = {}
+    n = len(line)
+    while i < n:
+        while i < n and line[i] in " ,":
+            i += 1
+        if i < n and line[i] == "}":
+            return labels, i + 1
+        eq = line.find("=", i)
+        if eq < 0 or eq + 1 >= n or line[eq + 1] != '"':
+            break
+        key = line[i:eq].strip()
+        j = eq + 2
+        buf = []
+        while j < n and line[j] != '"':
+            if line[j] == "\\" and j + 1 < n:
+                j += 1
+                buf.append({"n": "\n"}.get(line[j], line[j]))
+            else:
+                buf.append(line[j])
+            j += 1
+        labels[key] = "".join(buf)
+        i = j + 1
+    raise ValueError(f"malformed label set: {line!r}")
+
+class ExpositionScanner:
+    """
+    One pass over a Prometheus text exposition for a fixed set of series.
+    Lines are skipped on the sample name alone, labels are only parsed for
+    wanted names, and the scan stops once every series has been seen.
+    """
+    def __init__(self, specs: list[SeriesSpec]):
+        self.specs = specs
+        self.columns = [sp.column for sp in specs]
+        self.by_name: Dict[str, list[SeriesSpec]] = {}
+        for sp in specs:
+            self.by_name.setdefault(sp.name, []).append(sp)
+
+    def scan(self, text: str) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {c: None for c in self.columns}
+        remaining = len(self.specs)
+        pos = 0
+        end = len(text)
+        while pos < end and remaining:
+            nl = text.find("\n", pos)
+            if nl < 0:
+                nl = end
+            line = text[pos:nl].strip()
+            pos = nl + 1
+            if not line or line[0] == "#":
+                continue
+
+            brace = line.find("{")
+            space = line.find(" ")
+            cut = brace if 0 <= brace < space or (brace >= 0 and space < 0) else space
+            if cut < 0:
+                continue
+            wanted = self.by_name.get(line[:cut])
+            if wanted is None:
+                continue
+
+            labels: Dict[str, str] = {}
+            rest = line[cut:]
+            if line[cut] == "{":
+                try:
+                    labels, after = parse_labels(line, cut + 1)
+                except ValueError:
+                    continue
+                rest = line[after:]
+            toks = rest.split()
+            if not toks:
+                continue
             try:
-                return float(m.group(1))
-            except Exception:
-                return None
-    return None
+                value = float(toks[0])
+            except ValueError:
+                continue
+
+            for sp in wanted:
+                if out[sp.column] is None and all(labels.get(k) == v for k, v in sp.labels):
+                    out[sp.column] = value
+                    remaining -= 1
+        if remaining:
+            for c, v in out.items():
+                if v is None:
+                    _SELF.count(f"parse /metrics no {c}")
+        return out
+
+def quantile_column(q: str) -> str:
+    """0.5 -> lat_p50, 0.999 -> lat_p999"""
+    digits = q.split(".", 1)[1] if "." in q else q
+    if len(digits) == 1:
+        digits += "0"
+    return "lat_p" + digits
+
+def build_scanner(metric_name: str, quantile: str, extra_quantiles: list[str] = (),
+                  extra_series: list[SeriesSpec] = ()) -> ExpositionScanner:
+    specs = [SeriesSpec("lat_p99", metric_name, (("quantile", quantile),))]
+    for q in extra_quantiles:
+        specs.append(SeriesSpec(quantile_column(q), metric_name, (("quantile", q),)))
+    specs.extend(extra_series)
+    return ExpositionScanner(specs)
+
+def parse_lat_p99(metrics_text: str, metric_name: str, quantile: str) -> Optional[float]:
+    return build_scanner(metric_name, quantile).scan(metrics_text)["lat_p99"]
 
 def now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime())
 
-def emit_header():
-    print("t_iso,t_sec,u_cmd,sent_total,u_ach,lat_p99,inflight,err_per_sec")
+class LineSink:
+    """Rows written straight to the stream, as print() would."""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, line: str) -> None:
+        self.stream.write(line + "\n")
 
-def emit_row(t_iso: str, t_sec: float, u_cmd: float, sent_total: Optional[int], u_ach: Optional[float],
-             lat_p99: Optional[float], inflight: Optional[float], err_psec: Optional[float]):
-    def f(x: Optional[float], fmt: str) -> str:
-        if x is None:
-            return ""
-        return fmt % x
-    def i(x: Optional[int]) -> str:
-        return "" if x is None else str(x)
+    def flush(self) -> None:
+        self.stream.flush()
 
-    print(",".join([
+    def close(self) -> None:
+        self.stream.flush()
+
+class BufferedSink:
+    """
+    Rows go into a bounded in-memory ring buffer; a writer thread flushes them
+    in batches once flush_rows are pending or flush_interval has passed. The
+    sampling thread never touches the stream, so a slow disk or a stalled pipe
+    can't delay a tick. On overflow the oldest pending rows are dropped and
+    counted rather than blocking the sampler. If the stream fails (closed
+    pipe, full disk) the writer stops and the error is re-raised from the
+    next write/flush, or from close if nothing surfaced it before.
+    """
+    def __init__(self, stream, capacity: int = 65536, flush_rows: int = 256, flush_interval: float = 1.0):
+        self.stream = stream
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.buf: deque = deque(maxlen=capacity)
+        self.cond = threading.Condition()
+        self.closed = False
+        self.flushing = False
+        self.busy = False
+        self.error: Optional[BaseException] = None
+        self.error_seen = False
+        self.dropped = 0
+        self.batches = 0
+        self.rows = 0
+        self.thread = threading.Thread(target=self._run, name="collect-writer", daemon=True)
+        self.thread.start()
+
+    def _raise_error(self) -> None:
+        self.error_seen = True
+        raise self.error
+
+    def write(self, line: str) -> None:
+        with self.cond:
+            if self.error is not None:
+                self._raise_error()
+            if len(self.buf) == self.buf.maxlen:
+                self.dropped += 1
+            self.buf.append(line)
+            if len(self.buf) >= self.flush_rows:
+                self.cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                if not (self.closed or len(self.buf) >= self.flush_rows or (self.flushing and self.buf)):
+                    self.cond.wait(self.flush_interval)
+                lines = list(self.buf)
+                self.buf.clear()
+                closed = self.closed
+                self.busy = bool(lines)
+            if lines:
+                try:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+                except Exception as e:
+                    with self.cond:
+                        self.error = e
+                        self.busy = False
+                        self.cond.notify_all()
+                    return
+                self.batches += 1
+                self.rows += len(lines)
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """Block until every row written so far is on the stream (checkpoints)."""
+        with self.cond:
+            self.flushing = True
+            self.cond.notify_all()
+            while (self.buf or self.busy) and self.error is None:
+                self.cond.wait()
+            self.flushing = False
+            if self.error is not None:
+                self._raise_error()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        if self.error is not None:
+            if not self.error_seen:
+                self._raise_error()
+            return
+        self.stream.flush()
+
+_SINK = LineSink(sys.stdout)
+
+def emit_line(line: str) -> None:
+    _SINK.write(line)
+
+BASE_COLUMNS = ["t_iso", "t_sec", "u_cmd", "sent_total", "u_ach", "lat_p99", "inflight", "err_per_sec",
+                "tick_lag", "req_skew", "conn_new"]
+
+def sink_offset() -> int:
+    """Flush pending rows and return the output file size (the resume point)."""
+    _SINK.flush()
+    st = os.fstat(_SINK.stream.fileno())
+    if not stat.S_ISREG(st.st_mode):
+        # a pipe or terminal has no size to truncate back to
+        raise SystemExit("ERROR: step checkpoints need --out to be a regular file (not stdout or a pipe)")
+    return st.st_size
+
+def fmt_opt(x: Optional[float], fmt: str) -> str:
+    return "" if x is None else fmt % x
+
+def fmt_int(x: Optional[int]) -> str:
+    return "" if x is None else str(x)
+
+def format_row(t_iso: str, t_sec: float, u_cmd: float, sent_total: Optional[int], u_ach: Optional[float],
+               lat_p99: Optional[float], inflight: Optional[float], err_psec: Optional[float],
+               tick_lag: Optional[float] = None, req_skew: Optional[float] = None,
+               conn_new: Optional[int] = None, extra: list[Optional[float]] = ()) -> str:
+    f = fmt_opt
+    i = fmt_int
+    return ",".join([
         t_iso,
         f(t_sec, "%.3f"),
         f(u_cmd, "%.3f"),
@@ -137,120 +651,1019 @@ def emit_row(t_iso: str, t_sec: float, u_cmd: float, sent_total: Optional[int],
         f(lat_p99, "%.9f"),
         f(inflight, "%.3f"),
         f(err_psec, "%.6f"),
-    ]))
+        f(tick_lag, "%.4f"),
+        f(req_skew, "%.4f"),
+        i(conn_new),
+        *(f(x, "%.9g") for x in extra),
+    ])
+
+def emit_row(*fields, **kw):
+    emit_line(format_row(*fields, **kw))
+
+class TickSchedule:
+    """
+    Absolute monotonic tick grid: tick k fires at start + k*period.
+    A slow sample never shifts later ticks; ticks that are already in the past
+    are skipped instead of being fired back-to-back.
+    """
+    def __init__(self, period: float, start: Optional[float] = None):
+        self.period = period
+        self.start = time.monotonic() if start is None else start
+        self.k = 0
+
+    def next_due(self) -> float:
+        return self.start + self.k * self.period
+
+    def wait(self) -> float:
+        """Sleep until the next tick is due; returns its lateness (s)."""
+        due = self.next_due()
+        now = time.monotonic()
+        skipped = 0
+        if now > due + self.period:
+            # missed one or more ticks: jump to the latest grid point already passed
+            skipped = int((now - due) // self.period)
+            self.k += skipped
+            due = self.next_due()
+        elif now < due:
+            time.sleep(due - now)
+            now = time.monotonic()
+        self.k += 1
+        lag = max(0.0, now - due)
+        _SELF.tick(lag, skipped)
+        return lag
+
+    def resync(self) -> None:
+        """After a deliberate pause (step warmup), continue at the next grid point
+        without counting the ticks slept through as skipped or late."""
+        now = time.monotonic()
+        if now > self.next_due():
+            self.k = int(math.ceil((now - self.start) / self.period))
+
+@dataclass
+class Sample:
+    t_sec: float                      # tick fire time, s since t0
+    t_stats: Optional[float]          # /stats midpoint, s since t0 (used for u_ach)
+    sent_total: Optional[int]
+    inflight: Optional[float]
+    err_psec: Optional[float]
+    lat_p99: Optional[float]
+    u_ach: Optional[float]
+    req_skew: Optional[float]         # /stats response time - /metrics response time
+    extra: Dict[str, Optional[float]]  # additional /metrics series, by column
+    tick_lag: Optional[float] = None
+    conn_new: Optional[int] = None
+    t_iso: str = ""
+    detail: Any = None                # per-target readings (fan-out only)
+
+# /stats and /metrics are fetched side by side on every tick
+_FETCH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="collect")
+
+def timed_get(url: str, timeout: float) -> Tuple[Optional[str], float, float]:
+    t_req = time.monotonic()
+    err = None
+    try:
+        text = http_get(url, timeout=timeout)
+    except Exception as e:
+        text = None
+        err = classify_error(e)
+    t_resp = time.monotonic()
+    _SELF.request(endpoint_of(url), (t_resp - t_req) * 1000.0, err)
+    return text, t_req, t_resp
+
+def derive_u_ach(sent_total: Optional[int], t_stats: Optional[float],
+                 prev_sent: Optional[int], prev_t: Optional[float],
+                 u_ach_reported: Optional[float]) -> Optional[float]:
+    # u_ach: prefer Δsent_total/Δt, else fallback to reported throughput if available
+    u_ach = None
+    if sent_total is not None and prev_sent is not None and prev_t is not None and t_stats is not None:
+        dt = t_stats - prev_t
+        ds = sent_total - prev_sent
+        if dt > 0 and ds >= 0:
+            u_ach = ds / dt
+
+    if u_ach is None and u_ach_reported is not None and u_ach_reported > 0:
+        u_ach = float(u_ach_reported)
+    return u_ach
 
 def sample_once(loadgen_url: str, prom_url: str, metric_name: str, quantile: str,
                 u_cmd: float, t0: float,
                 prev_sent: Optional[int], prev_t: Optional[float],
-                timeout: float) -> Tuple[Optional[int], Optional[float], Optional[float], Optional[float], Optional[float]]:
-    # returns: sent_total, inflight, err_psec, lat_p99, u_ach
+                timeout: float, scanner: Optional[ExpositionScanner] = None) -> Sample:
+    """
+    Fetch /stats and /metrics concurrently. t0 and all returned times are on
+    the time.monotonic() clock; prev_t is the t_stats of the previous sample.
+    scanner picks lat_p99 and any extra series out of /metrics in one pass.
+    """
+    if scanner is None:
+        scanner = build_scanner(metric_name, quantile)
+    series: Dict[str, Optional[float]] = {c: None for c in scanner.columns}
     sent_total = inflight = err_psec = None
     lat_p99 = None
     u_ach_reported = None
 
+    t_fire = time.monotonic()
+    fut_stats = _FETCH_POOL.submit(timed_get, loadgen_url + "/stats", timeout)
+    fut_metrics = _FETCH_POOL.submit(timed_get, prom_url + "/metrics", timeout)
+    stats_text, s_req, s_resp = fut_stats.result()
+    metrics_text, m_req, m_resp = fut_metrics.result()
+
     # stats
-    try:
-        stats_text = http_get(loadgen_url + "/stats", timeout=timeout)
+    if stats_text is not None:
         sent_total, inflight, err_psec, u_ach_reported = parse_stats(stats_text)
-    except Exception:
-        pass
 
     # metrics
-    try:
-        metrics_text = http_get(prom_url + "/metrics", timeout=timeout)
-        lat_p99 = parse_lat_p99(metrics_text, metric_name=metric_name, quantile=quantile)
-    except Exception:
-        pass
+    if metrics_text is not None:
+        series = scanner.scan(metrics_text)
+    lat_p99 = series.pop("lat_p99")
 
-    # u_ach: prefer Δsent_total/Δt, else fallback to reported throughput if available
-    t_sec = time.time() - t0
-    u_ach = None
-    if sent_total is not None and prev_sent is not None and prev_t is not None:
-        dt = t_sec - prev_t
-        ds = sent_total - prev_sent
-        if dt > 0 and ds >= 0:
-            u_ach = ds / dt
+    req_skew = None
+    if stats_text is not None and metrics_text is not None:
+        req_skew = s_resp - m_resp
 
-    if u_ach is None and u_ach_reported is not None and u_ach_reported > 0:
-        u_ach = float(u_ach_reported)
+    t_stats = None
+    if stats_text is not None:
+        t_stats = 0.5 * (s_req + s_resp) - t0
+    u_ach = derive_u_ach(sent_total, t_stats, prev_sent, prev_t, u_ach_reported)
 
-    return sent_total, inflight, err_psec, lat_p99, u_ach
+    return Sample(
+        t_sec=t_fire - t0, t_stats=t_stats, sent_total=sent_total, inflight=inflight,
+        err_psec=err_psec, lat_p99=lat_p99, u_ach=u_ach, req_skew=req_skew, extra=series,
+    )
 
 def set_rate(loadgen_url: str, rate_key: str, rate: float, timeout: float):
     payload = {rate_key: rate}
-    http_post_json(loadgen_url + "/rate", payload, timeout=timeout)
+    url = loadgen_url + "/rate"
+    t_req = time.monotonic()
+    try:
+        http_post_json(url, payload, timeout=timeout)
+    except Exception as e:
+        _SELF.request(endpoint_of(url), (time.monotonic() - t_req) * 1000.0, classify_error(e))
+        raise
+    _SELF.request(endpoint_of(url), (time.monotonic() - t_req) * 1000.0)
 
-def run_steady(args):
-    t0 = time.time()
-    prev_sent = None
-    prev_t = None
+# columnar copy of the run (--bin-out), written on exit
+_RECORDER = None
 
-    set_rate(args.loadgen_url, args.rate_key, args.rate, args.timeout)
-    emit_header()
+def start_recorder(extra_cols: list[str]) -> None:
+    global _RECORDER
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+    import runbin
+    cols = runbin.SCHEMA + [(c, "f8") for c in ("tick_lag", "req_skew", "conn_new", *extra_cols)]
+    _RECORDER = runbin.ColumnWriter(cols)
 
-    start = time.time()
-    while True:
+def record_sample(u_cmd: float, s: Sample, tail: Dict[str, Optional[float]]) -> None:
+    if _RECORDER is None:
+        return
+    _RECORDER.append({
+        "t_sec": s.t_sec, "u_cmd": u_cmd, "sent_total": s.sent_total, "u_ach": s.u_ach,
+        "lat_p99": s.lat_p99, "inflight": s.inflight, "err_per_sec": s.err_psec,
+        "tick_lag": s.tick_lag, "req_skew": s.req_skew, "conn_new": s.conn_new, **s.extra, **tail,
+    })
+
+# live RLS ARX estimate (--rls), snapshotted to --rls-model
+_RLS = None
+_RLS_PATH = ""
+_RLS_EVERY = 0.0
+_RLS_NEXT = 0.0
+
+def start_rls(args) -> None:
+    global _RLS, _RLS_PATH, _RLS_EVERY, _RLS_NEXT
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+    import rls_arx
+    try:
+        na, nb, nk = (int(x) for x in args.rls.replace(",", " ").split())
+    except ValueError:
+        raise SystemExit(f"ERROR: --rls wants NA,NB,NK, got {args.rls!r}")
+    _RLS = rls_arx.RLSARX(na, nb, nk, lam=args.rls_lambda, ridge=args.rls_ridge,
+                          u_col=args.rls_u, y_col=args.rls_y)
+    _RLS_PATH = args.rls_model or (args.out + ".arx.json" if args.out else "arx_rls.json")
+    _RLS_EVERY = _RLS_NEXT = args.rls_every
+
+def rls_columns(extra_cols: list[str], tail_cols: list[str]) -> list[str]:
+    """Columns rls_sample() can feed the estimator (the numeric columns of a Sampler row)."""
+    return [c for c in BASE_COLUMNS if c != "t_iso"] + list(extra_cols) + list(tail_cols)
+
+def check_rls_columns(cols: list[str]) -> None:
+    missing = [c for c in (_RLS.u_col, _RLS.y_col) if c not in cols]
+    if missing:
+        raise SystemExit(f"ERROR: --rls-u/--rls-y column(s) {missing} not in the emitted columns {cols}")
+
+def rls_sample(u_cmd: float, s: Sample, tail: Dict[str, Optional[float]]) -> None:
+    global _RLS_NEXT
+    if _RLS is None:
+        return
+    row = {"t_sec": s.t_sec, "u_cmd": u_cmd, "sent_total": s.sent_total, "u_ach": s.u_ach,
+           "lat_p99": s.lat_p99, "inflight": s.inflight, "err_per_sec": s.err_psec,
+           "tick_lag": s.tick_lag, "req_skew": s.req_skew, "conn_new": s.conn_new, **s.extra, **tail}
+    _RLS.update(row.get(_RLS.u_col), row.get(_RLS.y_col))
+    if _RLS_EVERY and s.t_sec >= _RLS_NEXT and _RLS.n_used:
+        _RLS.snapshot(_RLS_PATH, t_sec=s.t_sec)
+        _RLS_NEXT = s.t_sec + _RLS_EVERY
+
+class BaseSampler:
+    """
+    sample() takes one tick's measurements, write() emits the row; callers
+    that compute something from the sample (the mpc controller) append their
+    own tail columns in between. tick() is both in one go.
+    """
+    extra_cols: list[str]
+    tail_cols: list[str] = []
+
+    def emit_header(self, tail_cols: list[str] = ()):
+        self.tail_cols = list(tail_cols)
+        header = self._header()
+        if _RLS is not None:
+            check_rls_columns(rls_columns(self.extra_cols, self.tail_cols))
+        if _RESUME is None:
+            emit_line(header)
+        elif header != _RESUME["header"]:
+            # appending to an existing file: the column layout has to match it
+            raise SystemExit("ERROR: --resume: column layout differs from the checkpointed run")
+        if self.args.bin_out:
+            start_recorder([*self.extra_cols, *self.tail_cols])
+
+    def tick(self, u_cmd: float, tick_lag: float) -> Sample:
+        s = self.sample(u_cmd, tick_lag)
+        self.write(u_cmd, s)
+        return s
+
+    def write(self, u_cmd: float, s: Sample, tail: Optional[Dict[str, Optional[float]]] = None):
+        tail = tail or {}
+        self._write(u_cmd, s, [tail.get(c) for c in self.tail_cols])
+        record_sample(u_cmd, s, tail)
+        rls_sample(u_cmd, s, tail)
+
+    def prev_state(self) -> Any:
+        """The Δsent_total state (JSON), checkpointed so a resumed run's first u_ach spans the outage."""
+        return None
+
+    def restore_prev(self, state: Any) -> None:
+        pass
+
+class Sampler(BaseSampler):
+    """Carries the Δsent_total state between ticks and writes one row per tick."""
+    def __init__(self, args, t0: float):
+        self.args = args
+        self.t0 = t0
+        self.prev_sent: Optional[int] = None
+        self.prev_t: Optional[float] = None
+        self.scanner = build_scanner(args.lat_metric, args.lat_quantile, args.extra_quantiles, args.series)
+        self.extra_cols = self.scanner.columns[1:]
+
+    def _header(self) -> str:
+        return ",".join([*BASE_COLUMNS, *self.extra_cols, *self.tail_cols])
+
+    def set_rate(self, u_cmd: float):
+        set_rate(self.args.loadgen_url, self.args.rate_key, u_cmd, self.args.timeout)
+
+    def sample(self, u_cmd: float, tick_lag: float) -> Sample:
+        a = self.args
         t_iso = now_iso()
-        sent_total, inflight, err_psec, lat_p99, u_ach = sample_once(
-            args.loadgen_url, args.prom_url, args.lat_metric, args.lat_quantile,
-            args.rate, t0, prev_sent, prev_t, args.timeout
+        opened_before = _HTTP.opened
+        s = sample_once(
+            a.loadgen_url, a.prom_url, a.lat_metric, a.lat_quantile,
+            u_cmd, self.t0, self.prev_sent, self.prev_t, a.timeout, scanner=self.scanner
         )
-        t_sec = time.time() - t0
-        emit_row(t_iso, t_sec, args.rate, sent_total, u_ach, lat_p99, inflight, err_psec)
+        s.t_iso = t_iso
+        s.tick_lag = tick_lag
+        s.conn_new = _HTTP.opened - opened_before
+
+        if s.sent_total is not None:
+            self.prev_sent = s.sent_total
+            self.prev_t = s.t_stats
+        return s
+
+    def prev_state(self) -> Any:
+        return [self.prev_sent, self.prev_t]
+
+    def restore_prev(self, state: Any) -> None:
+        self.prev_sent, self.prev_t = state
+
+    def _write(self, u_cmd: float, s: Sample, tail: list[Optional[float]]):
+        emit_row(s.t_iso, s.t_sec, u_cmd, s.sent_total, s.u_ach, s.lat_p99, s.inflight, s.err_psec,
+                 tick_lag=s.tick_lag, req_skew=s.req_skew, conn_new=s.conn_new,
+                 extra=[*(s.extra[c] for c in self.extra_cols), *tail])
+
+@dataclass
+class Target:
+    role: str   # "loadgen" (serves /rate + /stats) or "validator" (serves /metrics)
+    name: str
+    url: str
+
+def load_targets(path: str) -> list[Target]:
+    """
+    Target list, one per line: ROLE NAME URL, e.g.
+      loadgen   lg-1   http://10.0.0.21:7070
+      validator val-1  http://10.0.0.11:9464
+    Blank lines and '#' comments are ignored.
+    """
+    targets: list[Target] = []
+    with open(path, "r") as f:
+        for ln, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) != 3 or parts[0] not in ("loadgen", "validator"):
+                raise SystemExit(f"{path}:{ln}: expected 'loadgen|validator NAME URL', got: {line!r}")
+            targets.append(Target(parts[0], parts[1], parts[2].rstrip("/")))
+    names = [t.name for t in targets]
+    if len(set(names)) != len(names):
+        raise SystemExit(f"{path}: target names must be unique")
+    return targets
+
+def _sum_opt(xs: list[Optional[float]]) -> Optional[float]:
+    vals = [x for x in xs if x is not None]
+    return sum(vals) if vals else None
+
+class FanoutSampler(BaseSampler):
+    """
+    Samples every loadgen /stats and validator /metrics of a cluster on one
+    shared tick, all requests in flight at once. The canonical columns carry
+    cluster aggregates: u_cmd/sent_total/u_ach/inflight/err_per_sec summed over
+    loadgens, lat_p99 (and extra series) from the worst validator. req_skew is
+    the spread between the first and last response of the tick.
+
+    layout "wide": one row per tick, aggregates followed by NAME.COLUMN per target.
+    layout "long": one row per target per tick plus a "cluster" aggregate row,
+    with a leading target column.
+    """
+    LOADGEN_COLS = ["sent_total", "u_ach", "inflight", "err_per_sec"]
+
+    def __init__(self, args, t0: float):
+        self.args = args
+        self.t0 = t0
+        targets = load_targets(args.targets)
+        self.loadgens = [t for t in targets if t.role == "loadgen"]
+        self.validators = [t for t in targets if t.role == "validator"]
+        if not self.loadgens or not self.validators:
+            raise SystemExit("--targets needs at least one loadgen and one validator")
+        self.pool = ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="fanout")
+        self.parsers = {t.name: StatsParser() for t in self.loadgens}
+        self.prev: Dict[str, Tuple[Optional[int], Optional[float]]] = {t.name: (None, None) for t in self.loadgens}
+        self.scanner = build_scanner(args.lat_metric, args.lat_quantile, args.extra_quantiles, args.series)
+        self.extra_cols = self.scanner.columns[1:]
+        self.validator_cols = self.scanner.columns
+
+    def _header(self) -> str:
+        # the runbin copy (--bin-out) holds cluster aggregates only
+        if self.args.layout == "long":
+            return ",".join(["target", *BASE_COLUMNS, *self.extra_cols, *self.tail_cols])
+        cols = [*BASE_COLUMNS, *self.extra_cols, *self.tail_cols, "lat_p99_node"]
+        for t in self.loadgens:
+            cols += [f"{t.name}.{c}" for c in self.LOADGEN_COLS]
+        for t in self.validators:
+            cols += [f"{t.name}.{c}" for c in self.validator_cols]
+        return ",".join(cols)
+
+    def set_rate(self, u_cmd: float):
+        """u_cmd is the cluster total; it is split evenly across loadgens."""
+        share = u_cmd / len(self.loadgens)
+        futs = [self.pool.submit(set_rate, t.url, self.args.rate_key, share, self.args.timeout)
+                for t in self.loadgens]
+        for fut in futs:
+            fut.result()
+
+    def sample(self, u_cmd: float, tick_lag: float) -> Sample:
+        a = self.args
+        t_iso = now_iso()
+        opened_before = _HTTP.opened
+        t_fire = time.monotonic()
+        f_stats = {t.name: self.pool.submit(timed_get, t.url + "/stats", a.timeout) for t in self.loadgens}
+        f_metrics = {t.name: self.pool.submit(timed_get, t.url + "/metrics", a.timeout) for t in self.validators}
+
+        resp_times: list[float] = []
+        lg: Dict[str, list] = {}
+        t_stats_all: list[float] = []
+        for t in self.loadgens:
+            text, t_req, t_resp = f_stats[t.name].result()
+            sent = infl = err = ach = t_stats = None
+            rep = None
+            if text is not None:
+                resp_times.append(t_resp)
+                sent, infl, err, rep = self.parsers[t.name].parse(text)
+                t_stats = 0.5 * (t_req + t_resp) - self.t0
+                t_stats_all.append(t_stats)
+            prev_sent, prev_t = self.prev[t.name]
+            ach = derive_u_ach(sent, t_stats, prev_sent, prev_t, rep)
+            if sent is not None:
+                self.prev[t.name] = (sent, t_stats)
+            lg[t.name] = [sent, ach, infl, err]
+
+        val: Dict[str, Dict[str, Optional[float]]] = {}
+        for t in self.validators:
+            text, _, t_resp = f_metrics[t.name].result()
+            if text is not None:
+                resp_times.append(t_resp)
+                val[t.name] = self.scanner.scan(text)
+            else:
+                val[t.name] = {c: None for c in self.validator_cols}
+
+        # cluster aggregates; a loadgen that failed this tick leaves sent_total/u_ach empty
+        complete = all(v[0] is not None for v in lg.values())
+        sent_total = int(_sum_opt([v[0] for v in lg.values()])) if complete else None
+        u_ach = _sum_opt([v[1] for v in lg.values()]) if all(v[1] is not None for v in lg.values()) else None
+        inflight = _sum_opt([v[2] for v in lg.values()])
+        err_psec = _sum_opt([v[3] for v in lg.values()])
+        worst_node = None
+        lat_p99 = None
+        for name, series in val.items():
+            x = series["lat_p99"]
+            if x is not None and (lat_p99 is None or x > lat_p99):
+                lat_p99, worst_node = x, name
+        extra = [max((v[c] for v in val.values() if v[c] is not None), default=None) for c in self.extra_cols]
+        req_skew = (max(resp_times) - min(resp_times)) if len(resp_times) > 1 else None
+        conn_new = _HTTP.opened - opened_before
+        t_sec = t_fire - self.t0
+
+        return Sample(
+            t_sec=t_sec, t_stats=max(t_stats_all) if t_stats_all else None, sent_total=sent_total,
+            inflight=inflight, err_psec=err_psec, lat_p99=lat_p99, u_ach=u_ach, req_skew=req_skew,
+            extra=dict(zip(self.extra_cols, extra)), tick_lag=tick_lag, conn_new=conn_new,
+            t_iso=t_iso, detail=(lg, val, worst_node),
+        )
+
+    def prev_state(self) -> Any:
+        return {name: list(v) for name, v in self.prev.items()}
+
+    def restore_prev(self, state: Any) -> None:
+        # a renamed or added loadgen starts fresh (reported rate on its first tick)
+        for name, v in state.items():
+            if name in self.prev:
+                self.prev[name] = tuple(v)
+
+    def _write(self, u_cmd: float, s: Sample, tail: list[Optional[float]]):
+        lg, val, worst_node = s.detail
+        n_extra = len(self.extra_cols) + len(tail)
+        agg = format_row(s.t_iso, s.t_sec, u_cmd, s.sent_total, s.u_ach, s.lat_p99, s.inflight, s.err_psec,
+                         tick_lag=s.tick_lag, req_skew=s.req_skew, conn_new=s.conn_new,
+                         extra=[*(s.extra[c] for c in self.extra_cols), *tail])
+        if self.args.layout == "long":
+            emit_line("cluster," + agg)
+            share = u_cmd / len(self.loadgens)
+            for t in self.loadgens:
+                sent, ach, infl, err = lg[t.name]
+                emit_line(t.name + "," + format_row(s.t_iso, s.t_sec, share, sent, ach, None, infl, err,
+                                                    extra=[None] * n_extra))
+            for t in self.validators:
+                v = val[t.name]
+                emit_line(t.name + "," + format_row(s.t_iso, s.t_sec, u_cmd, None, None, v["lat_p99"], None, None,
+                                                    extra=[*(v[c] for c in self.extra_cols), *[None] * len(tail)]))
+        else:
+            cells = [agg, worst_node or ""]
+            for t in self.loadgens:
+                sent, ach, infl, err = lg[t.name]
+                cells += [fmt_int(sent), fmt_opt(ach, "%.6f"), fmt_opt(infl, "%.3f"), fmt_opt(err, "%.6f")]
+            for t in self.validators:
+                cells += [fmt_opt(val[t.name][c], "%.9g") for c in self.validator_cols]
+            emit_line(",".join(cells))
+
+def make_sampler(args, t0: float):
+    if args.targets:
+        return FanoutSampler(args, t0)
+    return Sampler(args, t0)
+
+# --resume state loaded from the step checkpoint; None for a fresh run
+_RESUME: Optional[Dict[str, Any]] = None
+
+def checkpoint_path(args) -> str:
+    if getattr(args, "checkpoint", ""):
+        return args.checkpoint
+    return args.out + ".ckpt.json" if args.out else ""
+
+def write_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def load_resume(args) -> Dict[str, Any]:
+    """Read the step checkpoint and cut --out back to the end of the last completed level."""
+    path = checkpoint_path(args)
+    if not args.out or not path:
+        raise SystemExit("ERROR: --resume needs --out (the raw file to append to)")
+    if args.bin_out:
+        raise SystemExit("ERROR: --resume does not support --bin-out; convert the CSV with analysis/runbin.py")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            ck = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"ERROR: --resume: cannot read checkpoint {path}: {e}")
+    if ck.get("levels") != args.levels:
+        raise SystemExit(f"ERROR: --resume: --levels differ from the checkpointed run ({path})")
+    try:
+        st = os.stat(args.out)
+    except OSError as e:
+        raise SystemExit(f"ERROR: --resume: cannot stat {args.out}: {e}")
+    if not stat.S_ISREG(st.st_mode):
+        raise SystemExit(f"ERROR: --resume: {args.out} is not a regular file")
+    size = st.st_size
+    if size < ck["out_offset"]:
+        raise SystemExit(f"ERROR: --resume: {args.out} is shorter than the checkpoint offset")
+    # rows of the interrupted level are dropped; that level is re-run from the start
+    with open(args.out, "r+b") as f:
+        f.truncate(ck["out_offset"])
+    print(f"[collect] resuming {args.out}: {ck['done']}/{len(ck['levels'])} levels done, "
+          f"dropped {size - ck['out_offset']} bytes of the interrupted level", file=sys.stderr)
+    return ck
+
+def run_steady(args):
+    t0 = time.monotonic()
+    sampler = make_sampler(args, t0)
 
-        if sent_total is not None:
-            prev_sent = sent_total
-            prev_t = t_sec
+    sampler.set_rate(args.rate)
+    sampler.emit_header()
 
-        if (time.time() - start) >= args.duration:
+    sched = TickSchedule(args.sample, start=t0)
+    while True:
+        lag = sched.wait()
+        sampler.tick(args.rate, lag)
+        if (sched.next_due() - t0) >= args.duration:
             break
-        time.sleep(args.sample)
+
+class SteadyHold:
+    """
+    Online end-of-level test for adaptive step holds. A level is steady once,
+    for every signal that has data (u_ach and lat_p99, filtered like
+    summarize_run.py), the distribution-free confidence interval of the
+    segment median is within rel_prec of the median, the medians of the
+    first and second half of the segment agree to the same precision, and
+    the second half (at least min_n samples) shows no monotone trend. A slow approach to the new
+    level (a first-order lag) passes the two precision checks early, since
+    its drift within a short window is small next to the noise; the trend
+    test catches it.
+    """
+    def __init__(self, rel_prec: float, conf: float, min_n: int):
+        self.rel_prec = rel_prec
+        self.z = statistics.NormalDist().inv_cdf(0.5 + conf / 2.0)
+        self.min_n = max(4, min_n)
+        self.series: Dict[str, list] = {"u_ach": [], "lat_p99": []}
+
+    def add(self, s: "Sample") -> None:
+        if s.u_ach is not None and s.u_ach > 0:
+            self.series["u_ach"].append(s.u_ach)
+        if s.lat_p99 is not None and s.lat_p99 > 0:
+            self.series["lat_p99"].append(s.lat_p99)
+
+    def trending(self, xs: list) -> bool:
+        """
+        Mann-Kendall test (the sign test behind the Theil-Sen slope):
+        S = sum over i < j of sign(x_j - x_i), counted in O(n log n) against
+        a sorted prefix, beyond z standard deviations of its no-trend
+        distribution (ties ignored, continuity-corrected).
+        """
+        seen: list = []
+        S = 0
+        for x in xs:
+            lo = bisect.bisect_left(seen, x)
+            hi = bisect.bisect_right(seen, x, lo)
+            S += lo - (len(seen) - hi)
+            seen.insert(hi, x)
+        n = len(xs)
+        var = n * (n - 1) * (2 * n + 5) / 18.0
+        return abs(S) - 1 > self.z * math.sqrt(var)
+
+    def median_ci(self, xs: list) -> Tuple[float, float, float]:
+        """Median with its order-statistic confidence interval (lo, med, hi)."""
+        ys = sorted(xs)
+        n = len(ys)
+        half = 0.5 * self.z * math.sqrt(n)
+        lo = max(0, int(math.floor(n / 2.0 - half)))
+        hi = min(n - 1, int(math.ceil(n / 2.0 + half)))
+        return ys[lo], statistics.median(ys), ys[hi]
+
+    def steady(self) -> bool:
+        have = [xs for xs in self.series.values() if xs]
+        if not have:
+            return False
+        for xs in have:
+            if len(xs) < self.min_n:
+                return False
+            lo, med, hi = self.median_ci(xs)
+            tol = self.rel_prec * abs(med)
+            if 0.5 * (hi - lo) > tol:
+                return False
+            h = len(xs) // 2
+            if abs(statistics.median(xs[h:]) - statistics.median(xs[:h])) > tol:
+                return False
+            # the recent half, but enough samples for the test to have power
+            if self.trending(xs[-max(self.min_n, len(xs) - h):]):
+                return False
+        return True
 
 def run_step(args):
-    t0 = time.time()
-    prev_sent = None
-    prev_t = None
+    ck_path = checkpoint_path(args)
+    ck = _RESUME
+    if ck is None:
+        t0 = time.monotonic()
+        sched_start = t0
+    else:
+        # t_sec keeps counting through the outage, so the gap shows up in the data
+        gap = max(0.0, time.time() - ck["t_unix"])
+        sched_start = time.monotonic()
+        t0 = sched_start - (ck["t_sec"] + gap)
+    sampler = make_sampler(args, t0)
 
-    emit_header()
+    sampler.emit_header()
+    if ck is None:
+        done = 0
+        ck = {"levels": args.levels, "done": 0, "t_sec": 0.0, "t_unix": time.time(), "sent_total": None,
+              "prev": None, "header": sampler._header(), "resumes": 0}
+    else:
+        done = ck["done"]
+        # t_sec continues across the outage, so the checkpointed Δsent_total state is on the same clock
+        if ck.get("prev") is not None:
+            sampler.restore_prev(ck["prev"])
+        elif ck.get("sent_total") is not None and isinstance(sampler, Sampler):
+            sampler.restore_prev([ck["sent_total"], ck["t_sec"]])   # checkpoint without "prev"
+        ck["resumes"] = ck.get("resumes", 0) + 1
+        # marker row: t_iso tagged, u_cmd empty, so the analysis scripts skip it
+        cols = ck["header"].count(",") + 1
+        emit_line(",".join([f"RESUME {now_iso()}", "%.3f" % (time.monotonic() - t0)] + [""] * (cols - 2)))
+    if ck_path:
+        ck["out_offset"] = sink_offset()
+        write_checkpoint(ck_path, ck)
 
-    for u in args.levels:
-        set_rate(args.loadgen_url, args.rate_key, u, args.timeout)
-        level_start = time.time()
+    # one grid for the whole run, so level changes don't shift the sample phase
+    sched = TickSchedule(args.sample, start=sched_start)
+    last: Optional[Sample] = None
+    for i in range(done, len(args.levels)):
+        u = args.levels[i]
+        sampler.set_rate(u)
+        level_start = time.monotonic()
+        test = SteadyHold(args.rel_prec, args.conf, args.min_samples) if args.adaptive else None
 
         if args.warmup > 0:
             time.sleep(args.warmup)
+            sched.resync()
 
+        how = "max hold"
         while True:
-            if (time.time() - level_start) >= args.hold:
+            held = sched.next_due() - level_start
+            if held >= args.hold:
                 break
+            if test is not None and held >= args.min_hold and test.steady():
+                how = "steady"
+                break
+            lag = sched.wait()
+            s = sampler.tick(u, lag)
+            last = s
+            if test is not None:
+                test.add(s)
+        if test is not None:
+            held = time.monotonic() - level_start
+            print(f"[collect] step u_cmd={u:g}: held {held:.1f}s ({how})", file=sys.stderr)
+        if ck_path:
+            ck.update(done=i + 1, t_unix=time.time(), out_offset=sink_offset())
+            if last is not None:
+                ck.update(t_sec=last.t_sec, sent_total=last.sent_total, prev=sampler.prev_state())
+            write_checkpoint(ck_path, ck)
 
-            t_iso = now_iso()
-            sent_total, inflight, err_psec, lat_p99, u_ach = sample_once(
-                args.loadgen_url, args.prom_url, args.lat_metric, args.lat_quantile,
-                u, t0, prev_sent, prev_t, args.timeout
-            )
-            t_sec = time.time() - t0
-            emit_row(t_iso, t_sec, u, sent_total, u_ach, lat_p99, inflight, err_psec)
+class ArxMpc:
+    """
+    Single-move MPC on an ARX(na, nb, nk) model from analysis/fit_arx_stdlib.py:
+      y[k] + a1 y[k-1] + ... + a_na y[k-na] = b1 u[k-nk] + ... + b_nb u[k-nk-nb+1]
+    Each tick picks one u_cmd, held over the prediction horizon, that minimizes
+      sum_j (y[k+j] - y_ref)^2 + move_weight * (u - u_prev)^2
+    in closed form (predictions are affine in u), then clips it to the rate
+    bounds and the per-tick slew limit. Model mismatch is absorbed by a
+    filtered output-bias estimate (offset-free tracking). Past inputs are the
+    measured u_ach, matching the throughput column the model was fitted on.
+    """
+    def __init__(self, model: Dict[str, Any], y_ref: float, u_min: float, u_max: float,
+                 du_max: float, horizon: int = 10, move_weight: float = 0.0, bias_gain: float = 0.3,
+                 sat_floor: float = 0.0):
+        self.na = int(model["na"])
+        self.nb = int(model["nb"])
+        self.nk = int(model["nk"])
+        self.a = [float(x) for x in model["a"]]
+        self.b = [float(x) for x in model["b"]]
+        if len(self.a) != self.na or len(self.b) != self.nb or self.nb < 1:
+            raise SystemExit("ARX model: len(a)/len(b) do not match na/nb")
+        self.y_ref = y_ref
+        self.u_min = u_min
+        self.u_max = u_max
+        self.du_max = du_max
+        self.horizon = max(1, horizon)
+        self.move_weight = move_weight
+        self.bias_gain = bias_gain
+        self.sat_floor = sat_floor
+        self.y_hist: deque = deque(maxlen=max(1, self.na))           # y[k], y[k-1], ...
+        self.u_hist: deque = deque(maxlen=max(1, self.nk + self.nb))  # u[k-1], u[k-2], ...
+        self.bias = 0.0
+        self.y_pred_next: Optional[float] = None
+
+    def _simulate(self, u_future: float) -> list[float]:
+        """Model predictions y[k+1..k+horizon] with u[k..] held at u_future (no bias)."""
+        ys = self.y_hist
+        us = self.u_hist
+        out: list[float] = []
+        for j in range(1, self.horizon + 1):
+            acc = 0.0
+            for i in range(1, self.na + 1):
+                idx = j - i
+                acc -= self.a[i - 1] * (ys[-idx] if idx <= 0 else out[idx - 1])
+            for m in range(self.nb):
+                idx = j - self.nk - m
+                acc += self.b[m] * (u_future if idx >= 0 else us[-idx - 1])
+            out.append(acc)
+        return out
+
+    def ready(self) -> bool:
+        return len(self.y_hist) == self.y_hist.maxlen and len(self.u_hist) == self.u_hist.maxlen
 
-            if sent_total is not None:
-                prev_sent = sent_total
-                prev_t = t_sec
+    def update(self, y_meas: Optional[float], u_ach: Optional[float], u_prev: float) -> float:
+        """Feed tick k's measurements; returns u_cmd for the next interval."""
+        if y_meas is None:
+            return u_prev
+        self.u_hist.appendleft(u_ach if u_ach is not None else u_prev)
+        self.y_hist.appendleft(y_meas)
+        if self.y_pred_next is not None:
+            innov = y_meas - self.y_pred_next
+            self.bias += self.bias_gain * (innov - self.bias)
+        if not self.ready():
+            return u_prev
 
-            time.sleep(args.sample)
+        free = self._simulate(0.0)
+        step = [y1 - y0 for y1, y0 in zip(self._simulate(1.0), free)]
+        num = self.move_weight * u_prev
+        den = self.move_weight
+        for f, g in zip(free, step):
+            num += g * (self.y_ref - self.bias - f)
+            den += g * g
+        u = num / den if den > 0 else u_prev
+
+        u = min(max(u, u_prev - self.du_max), u_prev + self.du_max)
+        if self.sat_floor > 0 and u_ach is not None and u_prev > 0 and u_ach / u_prev < self.sat_floor:
+            # loadgen can't deliver what we command: we're past the knee whatever the model says
+            u = min(u, u_ach / self.sat_floor)
+        u = min(max(u, self.u_min), self.u_max)
+
+        self.y_pred_next = self._simulate(u)[0]
+        return u
+
+def run_mpc(args):
+    with open(args.model, "r", encoding="utf-8") as f:
+        model = json.load(f)
+    ctrl = ArxMpc(model, y_ref=args.setpoint, u_min=args.u_min, u_max=args.u_max, du_max=args.du_max,
+                  horizon=args.horizon, move_weight=args.move_weight, bias_gain=args.bias_gain,
+                  sat_floor=args.sat_floor)
+
+    t0 = time.monotonic()
+    sampler = make_sampler(args, t0)
+
+    u = min(max(args.u0 if args.u0 is not None else args.u_min, args.u_min), args.u_max)
+    sampler.set_rate(u)
+    sampler.emit_header(["y_ref", "u_next", "ctrl_ms", "act_ms"])
+
+    sched = TickSchedule(args.sample, start=t0)
+    while True:
+        lag = sched.wait()
+        s = sampler.sample(u, lag)
+
+        t_ctrl = time.perf_counter()
+        u_next = ctrl.update(s.lat_p99, s.u_ach, u)
+        ctrl_ms = (time.perf_counter() - t_ctrl) * 1000.0
+
+        act_ms = None
+        if u_next != u:
+            try:
+                sampler.set_rate(u_next)
+                # measurement fire -> actuation acknowledged
+                act_ms = (time.monotonic() - t0 - s.t_sec) * 1000.0
+            except Exception as e:
+                print(f"[mpc] set_rate({u_next:.1f}) failed: {e}", file=sys.stderr)
+                u_next = u
+
+        sampler.write(u, s, {"y_ref": args.setpoint, "u_next": u_next, "ctrl_ms": ctrl_ms, "act_ms": act_ms})
+        u = u_next
+        if (sched.next_due() - t0) >= args.duration:
+            break
+
+# Fibonacci LFSR feedback taps (1-based) giving maximal-length sequences
+PRBS_TAPS = {3: (3, 2), 4: (4, 3), 5: (5, 3), 6: (6, 5), 7: (7, 6), 8: (8, 6, 5, 4), 9: (9, 5),
+             10: (10, 7), 11: (11, 9), 12: (12, 11, 10, 4), 13: (13, 12, 11, 8), 14: (14, 13, 12, 2),
+             15: (15, 14)}
+
+class Excitation:
+    """
+    Identification input around an operating point, one value per clock
+    period k (u changes only on clock boundaries):
+      prbs       u0 ± amp from a maximal-length LFSR (period 2^order - 1 clocks)
+      multisine  u0 + amp * sum of n_sines sines in [f_min, f_max], Schroeder
+                 phases (low crest factor), scaled so the peak is amp
+      chirp      u0 + amp * sin(phase), frequency swept log-wise from f_min to
+                 f_max over the run
+    """
+    def __init__(self, kind: str, u0: float, amp: float, clock: float, duration: float,
+                 seed: int = 1, order: int = 7, n_sines: int = 8,
+                 f_min: Optional[float] = None, f_max: Optional[float] = None):
+        self.kind = kind
+        self.u0 = u0
+        self.amp = amp
+        self.clock = clock
+        self.duration = duration
+        self.n_clocks = max(1, int(math.ceil(duration / clock)))
+        nyq = 0.5 / clock
+        self.f_max = f_max if f_max is not None else 0.5 * nyq
+        self.f_min = f_min if f_min is not None else max(1.0 / duration, self.f_max / 50.0)
+        # the band only shapes multisine/chirp; a PRBS ignores it
+        if kind in ("multisine", "chirp") and not 0 < self.f_min < self.f_max <= nyq:
+            raise SystemExit(f"ERROR: need 0 < --f-min < --f-max <= {nyq:g} Hz (half the clock rate)")
+
+        if kind == "prbs":
+            if order not in PRBS_TAPS:
+                raise SystemExit(f"ERROR: --prbs-order must be one of {sorted(PRBS_TAPS)}")
+            self.order = order
+            self.taps = PRBS_TAPS[order]
+            # any nonzero register is a phase of the same m-sequence
+            self.state = (seed % ((1 << order) - 1)) + 1
+            self.bits: List[int] = []
+        elif kind == "multisine":
+            # harmonics of the run length, spread evenly over the band
+            f0 = 1.0 / (self.n_clocks * clock)
+            ks = sorted(set(max(1, int(round(f / f0))) for f in
+                            (self.f_min + i * (self.f_max - self.f_min) / max(1, n_sines - 1) for i in range(n_sines))))
+            self.freqs = [k * f0 for k in ks]
+            m = len(self.freqs)
+            self.phases = [-math.pi * i * (i + 1) / m for i in range(m)]
+            peak = max(abs(self._multisine(k * clock)) for k in range(self.n_clocks)) or 1.0
+            self.scale = 1.0 / peak
+        elif kind != "chirp":
+            raise SystemExit(f"ERROR: unknown excitation {kind!r}")
+
+    def _multisine(self, t: float) -> float:
+        return sum(math.sin(2 * math.pi * f * t + ph) for f, ph in zip(self.freqs, self.phases))
+
+    def _prbs_bit(self, k: int) -> int:
+        while len(self.bits) <= k:
+            fb = 0
+            for tap in self.taps:
+                fb ^= (self.state >> (self.order - tap)) & 1
+            self.bits.append(self.state & 1)
+            self.state = (self.state >> 1) | (fb << (self.order - 1))
+        return self.bits[k]
+
+    def value(self, k: int) -> float:
+        """Planned u_cmd for clock period k."""
+        t = k * self.clock
+        if self.kind == "prbs":
+            x = 1.0 if self._prbs_bit(k) else -1.0
+        elif self.kind == "multisine":
+            x = self.scale * self._multisine(t)
+        else:
+            r = self.f_max / self.f_min
+            T = self.n_clocks * self.clock
+            x = math.sin(2 * math.pi * self.f_min * T / math.log(r) * (r ** (t / T) - 1.0))
+        return self.u0 + self.amp * x
+
+def run_excite(args):
+    clock = args.clock or args.sample
+    exc = Excitation(args.signal, args.u0, args.amp, clock, args.duration, seed=args.seed,
+                     order=args.prbs_order, n_sines=args.n_sines, f_min=args.f_min, f_max=args.f_max)
+    band = "" if args.signal == "prbs" else f" band={exc.f_min:.4g}..{exc.f_max:.4g} Hz"
+    print(f"[excite] {args.signal}: u0={args.u0:g} amp={args.amp:g} clock={clock:g}s{band}, "
+          f"{exc.n_clocks} clocks", file=sys.stderr)
+
+    t0 = time.monotonic()
+    sampler = make_sampler(args, t0)
+
+    k = 0
+    u_plan = exc.value(0)
+    u = min(max(u_plan, args.u_min), args.u_max)
+    sampler.set_rate(u)
+    sampler.emit_header(["u_plan", "clock_k"])
+
+    sched = TickSchedule(args.sample, start=t0)
+    while True:
+        lag = sched.wait()
+        k_now = int((sched.next_due() - args.sample - t0) / clock + 1e-9)
+        if k_now != k:
+            k = k_now
+            u_plan = exc.value(k)
+            u_new = min(max(u_plan, args.u_min), args.u_max)
+            if u_new != u:
+                try:
+                    sampler.set_rate(u_new)
+                    u = u_new
+                except Exception as e:
+                    print(f"[excite] set_rate({u_new:.1f}) failed: {e}", file=sys.stderr)
+        s = sampler.sample(u, lag)
+        sampler.write(u, s, {"u_plan": u_plan, "clock_k": k})
+        if (sched.next_due() - t0) >= args.duration:
+            break
 
 def parse_levels(s: str) -> list[float]:
     s = s.replace(",", " ")
     return [float(tok) for tok in s.split() if tok.strip()]
 
-def main():
-    ap = argparse.ArgumentParser()
+def add_common_args(ap: argparse.ArgumentParser) -> None:
+    """Endpoint, sampling and output options shared by every collector entry point."""
     ap.add_argument("--loadgen-url", default="http://127.0.0.1:7070")
     ap.add_argument("--prom-url", default="http://127.0.0.1:9464")
     ap.add_argument("--lat-metric", default="solana_transaction_latency_seconds")
     ap.add_argument("--lat-quantile", default="0.99")
+    ap.add_argument("--extra-quantiles", type=lambda s: s.replace(",", " ").split(), default=[],
+                    help='More quantiles of --lat-metric as lat_pNN columns, e.g. "0.5 0.9 0.999"')
+    ap.add_argument("--series", type=parse_series_spec, action="append", default=[],
+                    help='Extra /metrics series as COLUMN=NAME{label="v"} (repeatable)')
     ap.add_argument("--rate-key", default=DEFAULT_RATE_KEY)
     ap.add_argument("--sample", type=float, default=2.0)
     ap.add_argument("--timeout", type=float, default=2.5)
+    ap.add_argument("--targets", default="",
+                    help="Multi-node target list (ROLE NAME URL per line); overrides --loadgen-url/--prom-url")
+    ap.add_argument("--layout", choices=["wide", "long"], default="wide",
+                    help="Row layout for --targets runs")
+    ap.add_argument("--out", default="", help="Write rows to this file instead of stdout")
+    ap.add_argument("--bin-out", default="",
+                    help="Also write the run as a columnar runbin file (see analysis/runbin.py) on exit")
+    ap.add_argument("--self-stats", default="",
+                    help="Sidecar JSON with collector timing/failure stats (default: <--out>.collector.json)")
+    ap.add_argument("--late-tol", type=float, default=0.1,
+                    help="A tick firing later than this fraction of --sample counts as a missed deadline")
+    ap.add_argument("--rls", default="",
+                    help='Track a live ARX model by recursive least squares, orders as "NA,NB,NK" (e.g. "2,2,1")')
+    ap.add_argument("--rls-u", default="u_ach", help="input column for --rls")
+    ap.add_argument("--rls-y", default="lat_p99", help="output column for --rls")
+    ap.add_argument("--rls-lambda", type=float, default=0.995, help="RLS forgetting factor")
+    ap.add_argument("--rls-ridge", type=float, default=1e-6, help="RLS initial P = I/ridge")
+    ap.add_argument("--rls-every", type=float, default=30.0,
+                    help="Snapshot the model every this many seconds (0 = on exit only)")
+    ap.add_argument("--rls-model", default="",
+                    help="Model JSON for --rls, arx_model.json format (default: <--out>.arx.json)")
+    ap.add_argument("--buffered", action="store_true",
+                    help="High-frequency mode: rows go through a ring buffer flushed by a writer thread")
+    ap.add_argument("--buffer-rows", type=int, default=65536, help="Ring buffer capacity (rows) for --buffered")
+    ap.add_argument("--flush-rows", type=int, default=256, help="Flush once this many rows are pending")
+    ap.add_argument("--flush-interval", type=float, default=1.0, help="Flush at least this often (s)")
+
+def run_with_output(args, run) -> None:
+    """Set up the row sink, run run(args), and flush everything on exit or SIGINT/SIGTERM."""
+    global _SINK, _RESUME
+    if getattr(args, "resume", False):
+        _RESUME = load_resume(args)
+        out = open(args.out, "a", newline="")
+    else:
+        out = open(args.out, "w", newline="") if args.out else sys.stdout
+    if args.buffered:
+        _SINK = BufferedSink(out, capacity=args.buffer_rows, flush_rows=args.flush_rows,
+                             flush_interval=args.flush_interval)
+    else:
+        _SINK = LineSink(out)
+
+    if args.rls:
+        start_rls(args)
+
+    t0_unix = time.time()
+    _SELF.period = args.sample
+    _SELF.late_tol = args.late_tol
+    self_stats = args.self_stats or (args.out + ".collector.json" if args.out else "")
+
+    # SIGTERM unwinds like Ctrl-C so pending rows are flushed below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        print("[collect] interrupted, flushing buffered rows", file=sys.stderr)
+    finally:
+        _SINK.close()
+        if _RECORDER is not None:
+            _RECORDER.write(args.bin_out, meta={"mode": args.mode, "sample": args.sample,
+                                                "t0_unix": t0_unix})
+            print(f"[collect] wrote {len(_RECORDER)} rows -> {args.bin_out}", file=sys.stderr)
+        if _RLS is not None and _RLS.n_used:
+            _RLS.snapshot(_RLS_PATH)
+            m = _RLS.model()
+            print(f"[collect] rls: {m['n_used']} updates, a={m['a']} b={m['b']} -> {_RLS_PATH}",
+                  file=sys.stderr)
+        if out is not sys.stdout:
+            out.close()
+        if isinstance(_SINK, BufferedSink):
+            print(
+                f"[collect] writer: {_SINK.rows} rows in {_SINK.batches} batches, {_SINK.dropped} dropped",
+                file=sys.stderr,
+            )
+        _HTTP.close()
+        print(
+            f"[collect] http: {_HTTP.requests} requests, {_HTTP.opened} connections opened, "
+            f"{_HTTP.reused} reused, {_HTTP.reconnects} reconnects",
+            file=sys.stderr,
+        )
+        for line in _SELF.summary():
+            print(f"[collect] {line}", file=sys.stderr)
+        if self_stats:
+            report = _SELF.to_dict()
+            report["http"] = {"requests": _HTTP.requests, "opened": _HTTP.opened,
+                              "reused": _HTTP.reused, "reconnects": _HTTP.reconnects}
+            report["t0_unix"] = t0_unix
+            with open(self_stats, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"[collect] self-stats -> {self_stats}", file=sys.stderr)
+
+def main():
+    ap = argparse.ArgumentParser()
+    add_common_args(ap)
 
     sub = ap.add_subparsers(dest="mode", required=True)
 
@@ -260,15 +1673,51 @@ def main():
 
     sp = sub.add_parser("step")
     sp.add_argument("--levels", type=parse_levels, required=True)
-    sp.add_argument("--hold", type=float, required=True)
+    sp.add_argument("--hold", type=float, required=True, help="hold per level (s); the upper bound with --adaptive")
     sp.add_argument("--warmup", type=float, default=0.0)
+    sp.add_argument("--adaptive", action="store_true",
+                    help="end a level early once the u_ach and lat_p99 medians are steady and known to --rel-prec")
+    sp.add_argument("--min-hold", type=float, default=12.0,
+                    help="shortest adaptive hold (s); keep >= summarize_run.py's 8 s minimum segment")
+    sp.add_argument("--rel-prec", type=float, default=0.05,
+                    help="required half-width of the median confidence interval, relative to the median")
+    sp.add_argument("--conf", type=float, default=0.95, help="confidence level of the median interval")
+    sp.add_argument("--min-samples", type=int, default=8, help="fewest samples per signal before testing")
+    sp.add_argument("--checkpoint", default="",
+                    help="level checkpoint JSON, rewritten after every level (default: <--out>.ckpt.json)")
+    sp.add_argument("--resume", action="store_true",
+                    help="continue an interrupted run from its checkpoint, appending to --out")
 
-    args = ap.parse_args()
+    mp = sub.add_parser("mpc", help="closed-loop lat_p99 tracking with an ARX model")
+    mp.add_argument("--model", default="results/arx_model.json", help="ARX model JSON from fit_arx_stdlib.py")
+    mp.add_argument("--setpoint", type=float, required=True, help="lat_p99 target (s), just below the knee")
+    mp.add_argument("--u-min", type=float, default=50.0)
+    mp.add_argument("--u-max", type=float, required=True)
+    mp.add_argument("--u0", type=float, default=None, help="initial u_cmd (default: --u-min)")
+    mp.add_argument("--du-max", type=float, default=200.0, help="max |Δu_cmd| per tick (tx/s)")
+    mp.add_argument("--horizon", type=int, default=10, help="prediction horizon (ticks)")
+    mp.add_argument("--move-weight", type=float, default=0.0, help="penalty on Δu_cmd, s² per (tx/s)²")
+    mp.add_argument("--bias-gain", type=float, default=0.3, help="filter gain of the output-bias estimate")
+    mp.add_argument("--sat-floor", type=float, default=0.95,
+                    help="cap u_cmd at u_ach/sat_floor when saturation drops below this (0 = off)")
+    mp.add_argument("--duration", type=float, required=True)
 
-    if args.mode == "steady":
-        run_steady(args)
-    else:
-        run_step(args)
+    ex = sub.add_parser("excite", help="PRBS / multisine / chirp input around an operating point (ARX identification)")
+    ex.add_argument("signal", choices=["prbs", "multisine", "chirp"])
+    ex.add_argument("--u0", type=float, required=True, help="operating point (tx/s)")
+    ex.add_argument("--amp", type=float, required=True, help="excitation amplitude around --u0 (tx/s)")
+    ex.add_argument("--clock", type=float, default=0.0, help="u_cmd update period (s; default --sample)")
+    ex.add_argument("--duration", type=float, required=True)
+    ex.add_argument("--seed", type=int, default=1, help="PRBS register seed")
+    ex.add_argument("--prbs-order", type=int, default=7, help="LFSR length; period 2^order - 1 clocks")
+    ex.add_argument("--n-sines", type=int, default=8, help="multisine components")
+    ex.add_argument("--f-min", type=float, default=None, help="lowest frequency (Hz), multisine/chirp")
+    ex.add_argument("--f-max", type=float, default=None, help="highest frequency (Hz; default a quarter of the clock rate)")
+    ex.add_argument("--u-min", type=float, default=0.0, help="clip planned u_cmd below")
+    ex.add_argument("--u-max", type=float, default=float("inf"), help="clip planned u_cmd above")
+
+    args = ap.parse_args()
+    run_with_output(args, {"steady": run_steady, "step": run_step, "mpc": run_mpc, "excite": run_excite}[args.mode])
 
 if __name__ == "__main__":
     main()
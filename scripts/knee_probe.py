@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+knee_probe.py — in-process adaptive knee search.
+
+Runs on collect_csv.py's sampler: one process, one tick grid, one
+keep-alive connection pool for the whole search. Rows for every probe
+level go to a single cumulative CSV (stdout or --out), exactly as
+`collect_csv.py steady` would have written them.
+
+Search:
+  1. bracket: geometric ramp START, START*MULT, ... until a level triggers
+     (median saturation <= --sat-stop, median lat_p99 >= --lat-mult * baseline,
+     or median err_per_sec >= --err-stop) or --max is reached;
+  2. refine: bisection between the last good level and the first triggering
+     one until the bracket is narrower than --tol. A probe that follows a
+     triggering level starts from the backlog that level left behind, so
+     the rate first drops back to the last good level until inflight is
+     back to what it was there (at most --recover-max seconds).
+
+Medians are kept as running medians while the level is held, so the
+trigger test needs no re-read of the data. The search report and the
+suggested LEVELS_STR for knee_step_test.sh go to stderr.
+
+Usage:
+  python3 scripts/knee_probe.py --sample 2 --rate-key lambda --out data/raw/knee_probe.csv \\
+      --start 200 --mult 1.5 --max 8000 --dur 30
+"""
+
+import argparse
+import heapq
+import math
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import collect_csv
+from collect_csv import TickSchedule, make_sampler
+
+
+class RunningMedian:
+    """Two-heap running median: O(log n) insert, O(1) query."""
+
+    def __init__(self):
+        self.lo: List[float] = []  # max-heap (negated)
+        self.hi: List[float] = []  # min-heap
+
+    def __len__(self) -> int:
+        return len(self.lo) + len(self.hi)
+
+    def add(self, x: float) -> None:
+        if self.lo and x > -self.lo[0]:
+            heapq.heappush(self.hi, x)
+        else:
+            heapq.heappush(self.lo, -x)
+        if len(self.lo) > len(self.hi) + 1:
+            heapq.heappush(self.hi, -heapq.heappop(self.lo))
+        elif len(self.hi) > len(self.lo):
+            heapq.heappush(self.lo, -heapq.heappop(self.hi))
+
+    def median(self) -> float:
+        if not self.lo:
+            return float("nan")
+        if len(self.lo) > len(self.hi):
+            return -self.lo[0]
+        return 0.5 * (-self.lo[0] + self.hi[0])
+
+
+class LevelStats:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.sat = RunningMedian()
+        self.lat = RunningMedian()
+        self.err = RunningMedian()
+        self.infl = RunningMedian()
+
+    def add(self, s) -> None:
+        if s.u_ach is not None and s.u_ach > 0 and self.rate > 0:
+            self.sat.add(s.u_ach / self.rate)
+        if s.lat_p99 is not None and s.lat_p99 > 0:
+            self.lat.add(s.lat_p99)
+        if s.err_psec is not None:
+            self.err.add(s.err_psec)
+        if s.inflight is not None:
+            self.infl.add(s.inflight)
+
+
+class KneeProbe:
+    def __init__(self, args, sampler, sched: TickSchedule):
+        self.args = args
+        self.sampler = sampler
+        self.sched = sched
+        self.baseline_lat: Optional[float] = None
+        self.history: List[Tuple[float, bool, LevelStats]] = []
+
+    def hold(self, rate: float) -> LevelStats:
+        a = self.args
+        self.sampler.set_rate(rate)
+        st = LevelStats(rate)
+        level_start = time.monotonic()
+        while (self.sched.next_due() - level_start) < a.dur:
+            lag = self.sched.wait()
+            s = self.sampler.tick(rate, lag)
+            # the first --settle seconds of each level are logged but not judged
+            if time.monotonic() - level_start >= a.settle:
+                st.add(s)
+        return st
+
+    def recover(self, good: LevelStats) -> None:
+        """Hold the last good rate until inflight is back to its level there (or --recover-max)."""
+        a = self.args
+        self.sampler.set_rate(good.rate)
+        ref = good.infl.median()
+        limit = max(ref * a.recover_mult, ref + 1.0) if not math.isnan(ref) else math.nan
+        start = time.monotonic()
+        infl = None
+        while (self.sched.next_due() - start) < a.recover_max:
+            lag = self.sched.wait()
+            s = self.sampler.tick(good.rate, lag)
+            infl = s.inflight
+            if math.isnan(limit):
+                # no inflight to watch: give the plant --settle seconds instead
+                if time.monotonic() - start >= a.settle:
+                    break
+            elif infl is not None and infl <= limit:
+                break
+        log(f"recover: rate={good.rate:.0f} for {time.monotonic() - start:.1f}s "
+            f"(inflight {infl if infl is not None else 'n/a'}, target <= {limit:.0f})")
+
+    def triggered(self, st: LevelStats) -> bool:
+        a = self.args
+        sat_m, lat_m, err_m = st.sat.median(), st.lat.median(), st.err.median()
+        first = self.baseline_lat is None
+        if first and len(st.lat) >= a.min_lat_n:
+            self.baseline_lat = lat_m
+            log(f"baseline lat_p99 (median) = {lat_m:.6f} s (lat_n={len(st.lat)})")
+        log(f"rate={st.rate:.0f}  sat={sat_m:.3f} (n={len(st.sat)})  "
+            f"lat={lat_m:.6f}s (n={len(st.lat)})  err={err_m:.3f} (n={len(st.err)})")
+
+        # the level that sets the baseline (and any before it) only serves as the lower bracket
+        if first:
+            return False
+        if len(st.sat) >= a.min_sat_n and not math.isnan(sat_m) and sat_m <= a.sat_stop:
+            return True
+        if (self.baseline_lat is not None and len(st.lat) >= a.min_lat_n
+                and not math.isnan(lat_m) and lat_m >= a.lat_mult * self.baseline_lat):
+            return True
+        if len(st.err) >= a.min_err_n and not math.isnan(err_m) and err_m >= a.err_stop:
+            return True
+        return False
+
+    def probe(self, rate: float) -> bool:
+        st = self.hold(rate)
+        bad = self.triggered(st)
+        self.history.append((rate, bad, st))
+        return bad
+
+    def last_good(self) -> Optional[LevelStats]:
+        return next((st for _, bad, st in reversed(self.history) if not bad), None)
+
+    def run(self) -> Tuple[Optional[float], Optional[float]]:
+        """Returns (last good rate, first triggering rate); either may be None."""
+        a = self.args
+        good: Optional[float] = None
+        bad: Optional[float] = None
+
+        # 1. bracket
+        rate = a.start
+        while rate <= a.max:
+            log(f"bracket: rate={rate:.0f} tx/s for {a.dur:g}s")
+            if self.probe(rate):
+                bad = rate
+                break
+            good = rate
+            rate = float(math.ceil(rate * a.mult))
+
+        if bad is None:
+            return good, None
+
+        # 2. refine by bisection
+        while bad - good > a.tol:
+            mid = round(0.5 * (good + bad) / a.round_to) * a.round_to
+            if mid <= good or mid >= bad:
+                break
+            log(f"refine: [{good:.0f}, {bad:.0f}] -> rate={mid:.0f}")
+            prev = self.last_good()
+            if self.history[-1][1] and prev is not None:
+                self.recover(prev)
+            if self.probe(mid):
+                bad = mid
+            else:
+                good = mid
+        return good, bad
+
+
+def suggest_levels(knee: float) -> List[int]:
+    """Refined staircase around the knee (same shape knee_probe_adaptive.sh used to print)."""
+    f = [0.6, 0.75, 0.9, 1.0, 1.1, 1.25, 1.4]
+    levels = sorted(set(max(50, int(round(knee * x / 50) * 50)) for x in f))
+    pre = [x for x in [50, 150, 300, 450, 600, 800, 1000] if x < levels[0]]
+    up = pre + levels
+    down = list(reversed(pre + levels[:-1]))
+    return up + down
+
+
+def log(msg: str) -> None:
+    print(f"[probe] {msg}", file=sys.stderr, flush=True)
+
+
+def run_knee(args):
+    t0 = time.monotonic()
+    sampler = make_sampler(args, t0)
+    sampler.emit_header()
+    sched = TickSchedule(args.sample, start=t0)
+
+    probe = KneeProbe(args, sampler, sched)
+    good, bad = probe.run()
+
+    log(f"DONE after {len(probe.history)} levels, {time.monotonic() - t0:.0f}s")
+    if bad is None:
+        log(f"No saturation/latency trigger up to MAX={args.max:.0f}.")
+        log("Consider increasing --max, or lowering thresholds, or verify --rate-key.")
+        return
+    log(f"knee bracket: last good={good if good is not None else 'none'}  first trigger={bad:.0f}")
+
+    seq = suggest_levels(bad)
+    levels = " ".join(str(x) for x in seq)
+    log("Suggested LEVELS_STR:")
+    log(levels)
+    log("Suggested command (final knee step):")
+    log(f'HOLD=60 SAMPLE=2 LEVELS_STR="{levels}" bash scripts/knee_step_test.sh')
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Adaptive knee search (bracket + bisection) on the collector sampler.")
+    collect_csv.add_common_args(ap)
+    ap.add_argument("--start", type=float, default=200.0, help="starting rate (tx/s)")
+    ap.add_argument("--mult", type=float, default=1.5, help="geometric growth factor while bracketing")
+    ap.add_argument("--max", type=float, default=8000.0, help="safety cap (tx/s)")
+    ap.add_argument("--dur", type=float, default=30.0, help="hold per probe level (s)")
+    ap.add_argument("--settle", type=float, default=10.0,
+                    help="ignore the first seconds of each level for medians (a few plant time constants)")
+    ap.add_argument("--recover-max", type=float, default=60.0,
+                    help="longest hold at the last good rate before a probe that follows a trigger (s)")
+    ap.add_argument("--recover-mult", type=float, default=1.2,
+                    help="recovery ends once inflight <= this * the last good level's median inflight")
+    ap.add_argument("--tol", type=float, default=100.0, help="stop refining once the bracket is this narrow (tx/s)")
+    ap.add_argument("--round-to", type=float, default=10.0, help="round refinement levels to this step (tx/s)")
+    ap.add_argument("--sat-stop", type=float, default=0.92, help="trigger if median(u_ach/u_cmd) <= this")
+    ap.add_argument("--lat-mult", type=float, default=1.25, help="trigger if median(lat) >= this * baseline")
+    ap.add_argument("--err-stop", type=float, default=0.5, help="trigger if median(err_per_sec) >= this")
+    ap.add_argument("--min-sat-n", type=int, default=3)
+    ap.add_argument("--min-lat-n", type=int, default=3)
+    ap.add_argument("--min-err-n", type=int, default=3)
+    args = ap.parse_args()
+    args.mode = "knee"
+
+    collect_csv.run_with_output(args, run_knee)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,15 @@ HOLD="${HOLD:-60}"
 SAMPLE="${SAMPLE:-2}"
 WARMUP="${WARMUP:-0}"
 
+# ADAPTIVE=1: end each level once the u_ach/lat_p99 medians are steady (HOLD becomes the cap)
+ADAPTIVE="${ADAPTIVE:-0}"
+MIN_HOLD="${MIN_HOLD:-12}"
+REL_PREC="${REL_PREC:-0.05}"
+
+# The collector checkpoints after every level (${OUT}.ckpt.json); re-run with
+# the same OUT and RESUME=1 to continue an interrupted run.
+RESUME="${RESUME:-0}"
+
 # IMPORTANT: your loadgen expects {"lambda": ...}
 RATE_KEY="${RATE_KEY:-lambda}"
 
@@ -24,6 +33,18 @@ echo "[knee_step_test] OUT=${OUT}"
 echo "[knee_step_test] RATE_KEY=${RATE_KEY} HOLD=${HOLD}s SAMPLE=${SAMPLE}s WARMUP=${WARMUP}s"
 echo "[knee_step_test] LEVELS_STR=${LEVELS_STR}"
 
+ADAPTIVE_ARGS=()
+if [[ "${ADAPTIVE}" == "1" ]]; then
+  ADAPTIVE_ARGS=(--adaptive --min-hold "${MIN_HOLD}" --rel-prec "${REL_PREC}")
+  echo "[knee_step_test] ADAPTIVE MIN_HOLD=${MIN_HOLD}s REL_PREC=${REL_PREC}"
+fi
+
+RESUME_ARGS=()
+if [[ "${RESUME}" == "1" ]]; then
+  RESUME_ARGS=(--resume)
+  echo "[knee_step_test] RESUME from ${OUT}.ckpt.json"
+fi
+
 python3 scripts/collect_csv.py \
   --loadgen-url "${LOADGEN_URL}" \
   --prom-url "${PROM_URL}" \
@@ -31,10 +52,12 @@ python3 scripts/collect_csv.py \
   --lat-quantile "${LAT_QUANTILE}" \
   --rate-key "${RATE_KEY}" \
   --sample "${SAMPLE}" \
+  --out "${OUT}" \
   step \
     --levels "${LEVELS_STR}" \
     --hold "${HOLD}" \
     --warmup "${WARMUP}" \
-  | tee "${OUT}"
+    ${ADAPTIVE_ARGS[@]+"${ADAPTIVE_ARGS[@]}"} \
+    ${RESUME_ARGS[@]+"${RESUME_ARGS[@]}"}
 
 echo "[knee_step_test] Wrote ${OUT}"
@@ -1,60 +1,40 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+# Step campaign on the collector (scripts/collect_csv.py step).
+# The collector checkpoints after every level (${OUT}.ckpt.json); if the run
+# dies (tunnel drop, reboot), re-run with the same OUT and RESUME=1 to continue
+# from the next incomplete level, appending to the same raw file.
+
 LOADGEN_URL="${LOADGEN_URL:-http://127.0.0.1:7070}"
 PROM_URL="${PROM_URL:-http://127.0.0.1:9464}"
 
 HOLD="${HOLD:-60}"       # seconds per level
 SAMPLE="${SAMPLE:-2}"    # seconds between samples
+RATE_KEY="${RATE_KEY:-rate}"
 LEVELS_STR="${LEVELS_STR:-50 150 300 450 600 800 1000 800 600 450 300 150 50}"
 
-echo "t_sec,u_cmd,sent_total,u_ach,lat_p99"
-
-t0=$(date +%s)
-prev_sent=""
-prev_t=""
-
-for u in ${LEVELS_STR}; do
-  # set rate
-  curl -sS -X POST "${LOADGEN_URL}/rate" -H 'Content-Type: application/json' \
-    --data "{\"rate\": ${u}}" >/dev/null
-
-  level_start=$(date +%s)
-  while true; do
-    now=$(date +%s)
-    elapsed=$((now - level_start))
-    if (( elapsed >= HOLD )); then
-      break
-    fi
-
-    # pull stats from loadgen
-    stats=$(curl -sS "${LOADGEN_URL}/stats")
-    sent_total=$(echo "$stats" | sed -n 's/.*"sent_total":[ ]*\([0-9]*\).*/\1/p')
-    if [[ -z "${sent_total}" ]]; then sent_total=""; fi
-
-    # compute u_ach from sent_total
-    t_sec=$((now - t0))
-    u_ach=""
-    if [[ -n "${prev_sent}" && -n "${sent_total}" && -n "${prev_t}" ]]; then
-      dt=$((t_sec - prev_t))
-      ds=$((sent_total - prev_sent))
-      if (( dt > 0 )); then
-        u_ach=$(python3 - <<PY
-ds=${ds}; dt=${dt}
-print(ds/dt)
-PY
-)
-      fi
-    fi
-
-    # pull latency p99 from /metrics (very rough grep)
-    lat_p99=$(curl -sS "${PROM_URL}/metrics" | awk '/solana_transaction_latency_seconds.*quantile="0.99"/ {print $2; exit}')
-
-    echo "${t_sec},${u},${sent_total},${u_ach},${lat_p99}"
-
-    prev_sent="${sent_total}"
-    prev_t="${t_sec}"
-
-    sleep "${SAMPLE}"
-  done
-done
+OUT="${OUT:-data/raw/campaign_$(date +%F_%H%M%S).csv}"
+RESUME="${RESUME:-0}"
+mkdir -p "$(dirname "$OUT")"
+
+RESUME_ARGS=()
+if [[ "${RESUME}" == "1" ]]; then
+  RESUME_ARGS=(--resume)
+fi
+
+echo "[run_campaign] OUT=${OUT} RESUME=${RESUME}" >&2
+echo "[run_campaign] HOLD=${HOLD}s SAMPLE=${SAMPLE}s LEVELS_STR=${LEVELS_STR}" >&2
+
+python3 scripts/collect_csv.py \
+  --loadgen-url "${LOADGEN_URL}" \
+  --prom-url "${PROM_URL}" \
+  --rate-key "${RATE_KEY}" \
+  --sample "${SAMPLE}" \
+  --out "${OUT}" \
+  step \
+    --levels "${LEVELS_STR}" \
+    --hold "${HOLD}" \
+    ${RESUME_ARGS[@]+"${RESUME_ARGS[@]}"}
+
+echo "[run_campaign] Wrote ${OUT}" >&2
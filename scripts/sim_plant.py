@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+sim_plant.py — local stand-in for the loadgen + metrics exporter pair.
+
+Serves the interfaces collect_csv.py talks to:
+  POST /rate      {"<rate key>": <tx/s>}   (any single numeric field is accepted)
+  GET  /stats     loadgen JSON: sent_total, inflight, err_per_sec, sent_per_sec
+  GET  /metrics   Prometheus text with solana_transaction_latency_seconds{quantile=...}
+
+Behind them runs a small queueing plant, advanced lazily on every request:
+  - achieved rate is a soft minimum of the offered load and --capacity, so
+    saturation u_ach/u_cmd bends over around the knee (~0.92 at u = capacity);
+  - load that isn't served piles up as backlog (reported as inflight), drains
+    when the command drops, and overflows into err_per_sec past --max-backlog;
+  - p99 latency follows base + slope*rho/(1-rho) + backlog/capacity through a
+    first-order lag (--tau), with multiplicative noise on each scrape.
+
+Defaults put the knee near 3500 tx/s, like results/segments_knee_final.csv.
+Failures can be injected per request: HTTP 500s, slow responses and dropped
+connections. Keep-alive HTTP/1.1 on a threading server handles a few
+thousand requests per second, enough to benchmark the sampler and the
+mpc loop in CI.
+
+Usage:
+  python3 scripts/sim_plant.py                       # loadgen on :7070, metrics on :9464
+  python3 scripts/sim_plant.py --capacity 2000 --fail-rate 0.02 --seed 1
+  python3 scripts/collect_csv.py --sample 0.5 steady --rate 3000 --duration 60
+"""
+
+import argparse
+import json
+import math
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class Plant:
+    def __init__(self, capacity: float, base_lat: float, slope: float, tau: float, noise: float,
+                 max_backlog: float, sharpness: float, seed: Optional[int]):
+        self.capacity = capacity
+        self.base_lat = base_lat
+        self.slope = slope
+        self.tau = tau
+        self.noise = noise
+        self.max_backlog = max_backlog
+        self.sharpness = sharpness
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.rate = 0.0
+        self.sent_total = 0.0
+        self.backlog = 0.0
+        self.lat = base_lat
+        self.ach = 0.0
+        self.err = 0.0
+        self.lat_sum = 0.0
+        self.lat_count = 0
+        self.t_last = time.monotonic()
+
+    def _softmin(self, x: float) -> float:
+        c = self.capacity
+        if x <= 0 or c <= 0:
+            return 0.0
+        p = self.sharpness
+        return x / (1.0 + (x / c) ** p) ** (1.0 / p)
+
+    def _advance(self) -> None:
+        now = time.monotonic()
+        dt = now - self.t_last
+        if dt <= 0:
+            return
+        self.t_last = now
+
+        offered = self.rate + self.backlog / 1.0  # try to drain the backlog within ~1s
+        ach = self._softmin(offered)
+        self.backlog = max(0.0, self.backlog + (self.rate - ach) * dt)
+        err = 0.0
+        if self.backlog > self.max_backlog:
+            err = (self.backlog - self.max_backlog) / dt
+            self.backlog = self.max_backlog
+        self.ach = ach
+        self.err = err
+        self.sent_total += ach * dt
+
+        rho = min(ach / self.capacity, 0.99) if self.capacity > 0 else 0.0
+        lat_ss = self.base_lat + self.slope * rho / (1.0 - rho) + self.backlog / max(self.capacity, 1.0)
+        self.lat += (lat_ss - self.lat) * (1.0 - math.exp(-dt / self.tau)) if self.tau > 0 else lat_ss - self.lat
+        self.lat_count += int(ach * dt)
+        self.lat_sum += self.lat * 0.6 * ach * dt
+
+    def set_rate(self, rate: float) -> None:
+        with self.lock:
+            self._advance()
+            self.rate = max(0.0, rate)
+
+    def stats(self, workers: int) -> dict:
+        with self.lock:
+            self._advance()
+            sent, infl, err, ach = int(self.sent_total), self.backlog, self.err, self.ach
+        out = {
+            "rate": self.rate,
+            "sent_total": sent,
+            "inflight": round(infl),
+            "err_per_sec": err,
+            "sent_per_sec": ach,
+        }
+        if workers > 0:
+            # per-worker breakdown, like a sharded loadgen; totals stay at the top level
+            out["workers"] = [
+                {"id": i, "sent": sent // workers, "inflight": round(infl / workers), "tps": ach / workers}
+                for i in range(workers)
+            ]
+        return out
+
+    def p99(self) -> float:
+        with self.lock:
+            self._advance()
+            lat = self.lat
+            rng = self.rng.gauss(0.0, self.noise) if self.noise > 0 else 0.0
+        return max(1e-4, lat * (1.0 + rng))
+
+
+# p50/p90/p999 as fixed ratios of the p99 (a stable latency distribution shape)
+QUANTILES = [("0.5", 0.6), ("0.9", 0.85), ("0.99", 1.0), ("0.999", 1.3)]
+
+
+def render_metrics(plant: Plant, metric: str, filler: int) -> str:
+    p99 = plant.p99()
+    lines = [
+        f"# HELP {metric} Transaction confirmation latency (simulated)",
+        f"# TYPE {metric} summary",
+    ]
+    for q, ratio in QUANTILES:
+        lines.append(f'{metric}{{quantile="{q}"}} {p99 * ratio:.9f}')
+    lines.append(f"{metric}_sum {plant.lat_sum:.6f}")
+    lines.append(f"{metric}_count {plant.lat_count}")
+    # unrelated validator series, so scrape bodies have a realistic size
+    for i in range(filler):
+        lines.append(f'solana_validator_sim_gauge{{idx="{i}"}} {i}')
+    return "\n".join(lines) + "\n"
+
+
+def make_handler(plant: Plant, args):
+    rng = random.Random(None if args.seed is None else args.seed + 1)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body leave in one segment (flushed after each request), no Nagle stalls
+        wbufsize = 1 << 16
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt, *a):
+            pass
+
+        def _send(self, code: int, body: str, ctype: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _inject(self) -> bool:
+            """Apply fault injection; True if the request was consumed."""
+            with rng_lock:
+                r_fail, r_slow, r_drop = rng.random(), rng.random(), rng.random()
+            if r_drop < args.drop_rate:
+                self.close_connection = True
+                try:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return True
+            if r_slow < args.slow_rate:
+                time.sleep(args.slow_ms / 1000.0)
+            if r_fail < args.fail_rate:
+                self._send(500, '{"error":"injected"}', "application/json")
+                return True
+            return False
+
+        def do_GET(self):
+            if self._inject():
+                return
+            if self.path == "/stats":
+                self._send(200, json.dumps(plant.stats(args.workers)), "application/json")
+            elif self.path == "/metrics":
+                self._send(200, render_metrics(plant, args.metric, args.filler), "text/plain; version=0.0.4")
+            else:
+                self._send(404, "not found\n", "text/plain")
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(n) if n > 0 else b""
+            if self._inject():
+                return
+            if self.path != "/rate":
+                self._send(404, "not found\n", "text/plain")
+                return
+            try:
+                obj = json.loads(body.decode("utf-8") or "{}")
+                nums = [float(v) for v in obj.values() if isinstance(v, (int, float))]
+                if len(nums) != 1:
+                    raise ValueError("expected exactly one numeric field")
+            except Exception as e:
+                self._send(400, json.dumps({"error": str(e)}), "application/json")
+                return
+            plant.set_rate(nums[0])
+            self._send(200, json.dumps({"ok": True, "rate": nums[0]}), "application/json")
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulated loadgen /rate+/stats and exporter /metrics for offline runs.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=7070, help="loadgen port (/rate, /stats; also serves /metrics)")
+    ap.add_argument("--metrics-port", type=int, default=9464, help="exporter port (/metrics); 0 = loadgen port only")
+    ap.add_argument("--metric", default="solana_transaction_latency_seconds")
+    ap.add_argument("--capacity", type=float, default=3500.0, help="service capacity (tx/s)")
+    ap.add_argument("--sharpness", type=float, default=8.0, help="knee sharpness of the soft-min saturation")
+    ap.add_argument("--base-lat", type=float, default=0.40, help="p99 latency at light load (s)")
+    ap.add_argument("--slope", type=float, default=0.02, help="queueing term: lat += slope*rho/(1-rho)")
+    ap.add_argument("--tau", type=float, default=5.0, help="latency time constant (s)")
+    ap.add_argument("--noise", type=float, default=0.02, help="relative noise on each p99 scrape")
+    ap.add_argument("--max-backlog", type=float, default=20000.0, help="backlog beyond this turns into errors")
+    ap.add_argument("--workers", type=int, default=0, help="add a per-worker breakdown to /stats")
+    ap.add_argument("--filler", type=int, default=200, help="extra unrelated series in /metrics")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="probability of an HTTP 500")
+    ap.add_argument("--slow-rate", type=float, default=0.0, help="probability of a delayed response")
+    ap.add_argument("--slow-ms", type=float, default=500.0, help="delay of a slow response (ms)")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="probability of dropping the connection")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    plant = Plant(capacity=args.capacity, base_lat=args.base_lat, slope=args.slope, tau=args.tau,
+                  noise=args.noise, max_backlog=args.max_backlog, sharpness=args.sharpness, seed=args.seed)
+    handler = make_handler(plant, args)
+
+    servers = [Server((args.host, args.port), handler)]
+    if args.metrics_port and args.metrics_port != args.port:
+        servers.append(Server((args.host, args.metrics_port), handler))
+    for srv in servers[1:]:
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    ports = ", ".join(str(s.server_address[1]) for s in servers)
+    print(f"[sim] serving on {args.host}: {ports} (capacity={args.capacity:.0f} tx/s)", file=sys.stderr)
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for srv in servers:
+            srv.server_close()
+
+
+if __name__ == "__main__":
+    main()